@@ -0,0 +1,330 @@
+"""
+End-to-end benchmark: replay a recorded request log against the app in-process
+===============================================================================
+Requests go through the full ASGI stack (httpx.ASGITransport) without a
+network server. The fake LLM backend is used unless LLM_BACKEND is set.
+
+Log format (JSONL), one request per line:
+    {"t": 0.25, "method": "POST", "path": "/rag/query", "body": {...}}
+"t" (seconds from start) is only used with --replay-timing.
+
+Examples:
+    python benchmark.py                          # 16 concurrent clients
+    python benchmark.py --concurrency 64 --requests 2000
+    python benchmark.py --rate 50                # open loop, Poisson arrivals at 50 req/s
+    python benchmark.py --replay-timing --speed 2
+    python benchmark.py --compare benchmarks/results/<old>.json
+
+Results (p50/p95/p99 latency, throughput, memory per endpoint) are saved
+to benchmarks/results/ as JSON, named by timestamp and git commit.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ROOT = Path(__file__).parent
+DEFAULT_LOG = ROOT / "benchmarks" / "replay.jsonl"
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+
+
+def load_log(path: Path) -> List[Dict[str, Any]]:
+    """Read the request log, skipping lines that aren't HTTP requests"""
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if "path" not in entry:
+                print(f"[WARNING] {path}:{line_no} has no 'path', skipped")
+                continue
+            entry.setdefault("method", "POST")
+            entries.append(entry)
+    if not entries:
+        raise SystemExit(f"[ERROR] No replayable requests in {path}")
+    return entries
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def rss_mb() -> float:
+    """Current resident set size in MB (Linux), falling back to peak RSS"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def send(client, entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Send one request, reading the whole body (including streamed responses)"""
+    start = time.perf_counter()
+    try:
+        async with client.stream(entry["method"], entry["path"], json=entry.get("body")) as response:
+            async for _ in response.aiter_bytes():
+                pass
+            ok = response.status_code < 400
+    except Exception:
+        ok = False
+    return {"path": entry["path"], "latency": time.perf_counter() - start, "ok": ok}
+
+
+async def run_closed_loop(client, entries, total, concurrency):
+    """`concurrency` clients each send their next request as soon as the last one finishes"""
+    results = []
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            results.append(await send(client, entries[i % len(entries)]))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results
+
+
+async def run_open_loop(client, entries, total, rate, replay_timing, speed, seed):
+    """Send requests on a schedule regardless of how fast responses come back"""
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    tasks = []
+    offset = 0.0
+    for i in range(total):
+        entry = entries[i % len(entries)]
+        if replay_timing:
+            cycle = i // len(entries)
+            span = entries[-1].get("t", 0.0)
+            offset = (entry.get("t", 0.0) + cycle * span) / speed
+        else:
+            offset += rng.expovariate(rate)
+
+        delay = offset - (time.perf_counter() - start)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(send(client, entry)))
+    return await asyncio.gather(*tasks)
+
+
+async def measure_allocations(client, entries, samples):
+    """Peak Python allocation per request for each endpoint (tracemalloc, sequential)"""
+    by_path = defaultdict(list)
+    for entry in entries:
+        by_path[entry["path"]].append(entry)
+
+    allocations = {}
+    tracemalloc.start()
+    for path, path_entries in by_path.items():
+        peaks = []
+        for i in range(samples):
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            await send(client, path_entries[i % len(path_entries)])
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+        allocations[path] = sum(peaks) / len(peaks) / 1024
+    tracemalloc.stop()
+    return allocations
+
+
+def summarize(results, elapsed, allocations) -> Dict[str, Any]:
+    by_path = defaultdict(list)
+    for result in results:
+        by_path[result["path"]].append(result)
+
+    def stats(items):
+        latencies = sorted(r["latency"] * 1000 for r in items)
+        return {
+            "requests": len(items),
+            "errors": sum(1 for r in items if not r["ok"]),
+            "throughput_rps": len(items) / elapsed if elapsed else 0.0,
+            "mean_ms": sum(latencies) / len(latencies),
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "max_ms": latencies[-1],
+        }
+
+    endpoints = {}
+    for path, items in sorted(by_path.items()):
+        endpoints[path] = stats(items)
+        if path in allocations:
+            endpoints[path]["alloc_peak_kib_per_request"] = allocations[path]
+
+    return {"overall": stats(results), "endpoints": endpoints}
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    header = f"{'endpoint':<22}{'reqs':>6}{'err':>5}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'KiB/req':>9}"
+    print(header)
+    print("-" * len(header))
+    rows = list(report["endpoints"].items()) + [("ALL", report["overall"])]
+    for path, s in rows:
+        alloc = s.get("alloc_peak_kib_per_request")
+        print(f"{path:<22}{s['requests']:>6}{s['errors']:>5}{s['throughput_rps']:>9.1f}"
+              f"{s['p50_ms']:>9.1f}{s['p95_ms']:>9.1f}{s['p99_ms']:>9.1f}"
+              f"{(f'{alloc:.0f}' if alloc is not None else '-'):>9}")
+        if baseline:
+            old = baseline["overall"] if path == "ALL" else baseline["endpoints"].get(path)
+            if old:
+                print(f"{'  vs baseline':<22}{'':>11}"
+                      f"{_delta(s['throughput_rps'], old['throughput_rps']):>9}"
+                      f"{_delta(s['p50_ms'], old['p50_ms']):>9}"
+                      f"{_delta(s['p95_ms'], old['p95_ms']):>9}"
+                      f"{_delta(s['p99_ms'], old['p99_ms']):>9}")
+
+    memory = report["memory"]
+    print(f"\nRSS: {memory['rss_start_mb']:.1f} MB -> {memory['rss_end_mb']:.1f} MB "
+          f"(peak {memory['rss_peak_mb']:.1f} MB)")
+
+
+def _delta(new: float, old: float) -> str:
+    return f"{(new - old) / old * 100:+.0f}%" if old else "-"
+
+
+async def wait_ready(client):
+    """Poll /readyz until the index is loaded; exit if loading failed"""
+    while True:
+        response = await client.get("/readyz")
+        if response.status_code == 200:
+            return
+        if response.json().get("status") == "failed":
+            raise SystemExit(f"[ERROR] Service failed to start: {response.json().get('error')}")
+        await asyncio.sleep(0.1)
+
+
+async def main(args):
+    os.environ.setdefault("LLM_BACKEND", "fake")
+    # Load the index inside the lifespan rather than in the background, so
+    # the first requests aren't answered 503
+    os.environ.setdefault("RAG_WARMUP", "eager")
+    if args.no_cache:
+        os.environ["LLM_CACHE_ENABLED"] = "false"
+        os.environ["SEMANTIC_CACHE_ENABLED"] = "false"
+
+    import httpx
+
+    rss_before_import = rss_mb()
+    import main as service
+    app = service.app
+
+    entries = load_log(args.log)
+    total = args.requests or len(entries)
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            await wait_ready(client)
+            # Warm up code paths (and the prebuilt index) before measuring
+            for entry in entries[:min(len(entries), 5)]:
+                await send(client, entry)
+
+            rss_start = rss_mb()
+            start = time.perf_counter()
+            if args.rate or args.replay_timing:
+                results = await run_open_loop(
+                    client, entries, total, args.rate, args.replay_timing, args.speed, args.seed
+                )
+            else:
+                results = await run_closed_loop(client, entries, total, args.concurrency)
+            elapsed = time.perf_counter() - start
+            rss_end = rss_mb()
+
+            allocations = {}
+            if args.memory_samples:
+                allocations = await measure_allocations(client, entries, args.memory_samples)
+
+    report = summarize(results, elapsed, allocations)
+    report["memory"] = {
+        "rss_before_app_import_mb": rss_before_import,
+        "rss_start_mb": rss_start,
+        "rss_end_mb": rss_end,
+        "rss_peak_mb": max(peak_rss_mb(), rss_end),
+    }
+    report["meta"] = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "llm_backend": os.environ.get("LLM_BACKEND"),
+        "log": str(args.log),
+        "mode": "replay-timing" if args.replay_timing else ("open" if args.rate else "closed"),
+        "concurrency": args.concurrency,
+        "rate": args.rate,
+        "speed": args.speed,
+        "elapsed_s": elapsed,
+    }
+    return report
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay a request log against the app in-process")
+    parser.add_argument("--log", type=Path, default=DEFAULT_LOG, help="JSONL request log")
+    parser.add_argument("--requests", type=int, default=0, help="total requests (default: one pass over the log)")
+    parser.add_argument("--concurrency", type=int, default=16, help="closed-loop clients")
+    parser.add_argument("--rate", type=float, default=0.0, help="open-loop arrival rate (req/s, Poisson)")
+    parser.add_argument("--replay-timing", action="store_true", help="use the log's recorded 't' offsets")
+    parser.add_argument("--speed", type=float, default=1.0, help="time compression for --replay-timing")
+    parser.add_argument("--seed", type=int, default=0, help="seed for Poisson arrivals")
+    parser.add_argument("--memory-samples", type=int, default=10,
+                        help="sequential requests per endpoint for allocation measurement (0 to skip)")
+    parser.add_argument("--no-cache", action="store_true", help="disable the LLM response and semantic caches")
+    parser.add_argument("--output", type=Path, help="results file (default: benchmarks/results/<time>_<commit>.json)")
+    parser.add_argument("--compare", type=Path, help="previous results file to diff against")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    sys.path.insert(0, str(ROOT))
+
+    report = asyncio.run(main(args))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    print(f"\nSmartCoach AI Service - Benchmark ({report['meta']['mode']}, commit {report['meta']['commit']})")
+    print("=" * 78)
+    print_report(report, baseline)
+
+    output = args.output
+    if output is None:
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+        output = RESULTS_DIR / f"{stamp}_{report['meta']['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n[OK] Results saved to {output}")
@@ -0,0 +1,197 @@
+"""
+Search micro-benchmark: per-query retrieval latency by corpus size
+==================================================================
+Scores queries against synthetic TF-IDF corpora (L2-normalised sparse
+rows over a 5,000-term vocabulary with Zipf-distributed terms, like the
+fitted index) and compares three ways of getting the top k:
+
+- cosine:   sklearn cosine_similarity (re-normalises the matrix on every
+            call) and a full argsort, the original implementation
+- dot:      sparse dot product against the pre-normalised rows, top k
+            with argpartition (search_engine.top_k)
+- postings: the inverted index the service uses (InvertedIndex.search),
+            which only touches documents sharing a term with the query
+
+All three return the same documents; the benchmark checks that.
+
+Examples:
+    python benchmark_search.py                       # 1k, 100k and 1M documents
+    python benchmark_search.py --docs 1000 10000 --queries 500
+    python benchmark_search.py --skip cosine         # large corpora without the slow baseline
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from benchmark import RESULTS_DIR, git_commit, percentile
+from search_engine import InvertedIndex, top_k
+
+METHODS = ("cosine", "dot", "postings")
+
+
+def normalize_rows(matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+    """L2-normalise every non-empty row (what TfidfVectorizer's norm='l2' does)"""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.csr_matrix(sparse.diags((1.0 / norms).astype(np.float32)) @ matrix)
+
+
+def zipf_terms(rng: np.random.Generator, ranking: np.ndarray, size: int) -> np.ndarray:
+    """Term ids drawn with frequency falling off with their position in ranking"""
+    weights = 1.0 / (np.arange(len(ranking)) + 10.0)
+    return ranking[rng.choice(len(ranking), size=size, p=weights / weights.sum())]
+
+
+def term_ranking(n_terms: int, seed: int) -> np.ndarray:
+    """Term ids from most to least frequent, shared by the corpus and the queries"""
+    return np.random.default_rng(seed).permutation(n_terms)
+
+
+def synthetic_corpus(n_docs: int, n_terms: int, terms_per_doc: int, seed: int) -> sparse.csr_matrix:
+    """(documents x terms) TF-IDF-like matrix with L2-normalised rows"""
+    rng = np.random.default_rng(seed)
+    columns = zipf_terms(rng, term_ranking(n_terms, seed), n_docs * terms_per_doc).astype(np.int32)
+    indptr = np.arange(0, n_docs * terms_per_doc + 1, terms_per_doc, dtype=np.int64)
+    data = rng.uniform(0.5, 2.0, size=len(columns)).astype(np.float32)
+    matrix = sparse.csr_matrix((data, columns, indptr), shape=(n_docs, n_terms))
+    matrix.sum_duplicates()
+    return normalize_rows(matrix)
+
+
+def synthetic_queries(n_queries: int, n_terms: int, seed: int) -> List[sparse.csr_matrix]:
+    """Short queries (2-6 terms), each a normalised 1 x terms row"""
+    rng = np.random.default_rng(seed + 1)
+    ranking = term_ranking(n_terms, seed)
+    queries = []
+    for _ in range(n_queries):
+        columns = np.unique(zipf_terms(rng, ranking, int(rng.integers(2, 7))))
+        data = rng.uniform(0.5, 2.0, size=len(columns)).astype(np.float32)
+        row = sparse.csr_matrix((data, columns, [0, len(columns)]), shape=(1, n_terms))
+        queries.append(normalize_rows(row))
+    return queries
+
+
+def searchers(matrix: sparse.csr_matrix, k: int) -> Dict[str, Callable[[sparse.csr_matrix], List[int]]]:
+    """Method name -> function returning the top-k document ids for one query"""
+    index = InvertedIndex(matrix)
+
+    def cosine(query):
+        from sklearn.metrics.pairwise import cosine_similarity
+        scores = cosine_similarity(query, matrix).ravel()
+        best = np.argsort(scores)[::-1][:k]
+        return [int(i) for i in best if scores[i] > 0]
+
+    def dot(query):
+        scores = (matrix @ query.T).tocsc()
+        doc_ids, _ = top_k(scores.indices, scores.data, k)
+        return doc_ids.tolist()
+
+    def postings(query):
+        return [doc for doc, _ in index.search(query, k)]
+
+    return {"cosine": cosine, "dot": dot, "postings": postings}
+
+
+def time_method(search: Callable, queries: List[sparse.csr_matrix]) -> Tuple[Dict[str, float], List[List[int]]]:
+    """Per-query latency stats (ms) and each query's results"""
+    search(queries[0])  # warm up (imports, allocator)
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query))
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "mean_ms": statistics.fmean(latencies),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+    }, results
+
+
+def same_documents(a: List[List[int]], b: List[List[int]], matrix, queries) -> bool:
+    """Whether two methods agree, allowing ties at the k-th score to be broken differently"""
+    for left, right, query in zip(a, b, queries):
+        if left == right:
+            continue
+        scores = (matrix @ query.T).toarray().ravel()
+        if not np.allclose(np.sort(scores[left]), np.sort(scores[right]), rtol=1e-5):
+            return False
+    return True
+
+
+def run(n_docs: int, args) -> Dict[str, Any]:
+    start = time.perf_counter()
+    matrix = synthetic_corpus(n_docs, args.terms, args.terms_per_doc, args.seed)
+    queries = synthetic_queries(args.queries, args.terms, args.seed)
+    build_s = time.perf_counter() - start
+
+    result: Dict[str, Any] = {"documents": n_docs, "nnz": int(matrix.nnz), "corpus_build_s": build_s}
+    reference = None
+    for method, search in searchers(matrix, args.k).items():
+        if method in args.skip:
+            continue
+        stats, results = time_method(search, queries)
+        if reference is None:
+            reference = results
+        stats["agrees"] = same_documents(reference, results, matrix, queries)
+        result[method] = stats
+    return result
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Per-query top-k retrieval latency by corpus size")
+    parser.add_argument("--docs", type=int, nargs="+", default=[1000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=200, help="queries timed per corpus size")
+    parser.add_argument("--k", type=int, default=5, help="results per query")
+    parser.add_argument("--terms", type=int, default=5000, help="vocabulary size (the index keeps 5,000)")
+    parser.add_argument("--terms-per-doc", type=int, default=40, help="term occurrences per document")
+    parser.add_argument("--skip", nargs="+", choices=METHODS, default=[], help="methods not to run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="results file (default: benchmarks/results/search_<time>_<commit>.json)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    methods = [m for m in METHODS if m not in args.skip]
+    print(f"{'documents':>10}" + "".join(f"{m + ' p50 ms':>16}{'p95':>8}" for m in methods))
+    print("-" * (10 + 24 * len(methods)))
+    results = []
+    for n_docs in args.docs:
+        result = run(n_docs, args)
+        results.append(result)
+        print(f"{n_docs:>10}" + "".join(
+            f"{result[m]['p50_ms']:>16.3f}{result[m]['p95_ms']:>8.3f}" for m in methods
+        ))
+        if not all(result[m]["agrees"] for m in methods):
+            print(f"[WARNING] Methods returned different documents at {n_docs} documents")
+
+    report = {
+        "results": results,
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": sys.version.split()[0],
+            "queries": args.queries,
+            "k": args.k,
+            "terms": args.terms,
+            "terms_per_doc": args.terms_per_doc,
+        },
+    }
+    output = args.output
+    if output is None:
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+        output = RESULTS_DIR / f"search_{stamp}_{report['meta']['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n[OK] Results saved to {output}")
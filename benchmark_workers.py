@@ -0,0 +1,191 @@
+"""
+Worker scaling benchmark: startup time and memory per worker under gunicorn
+===========================================================================
+Starts the service with 1/4/8 workers, with and without preload_app, and
+reports time until every worker is serving plus per-process memory:
+
+- RSS counts every page a process touches, shared or not
+- PSS splits shared pages between the processes sharing them, so the sum
+  of PSS is the real memory cost of the whole deployment
+
+Linux only (reads /proc). Uses the fake LLM backend.
+
+Examples:
+    python benchmark_workers.py
+    python benchmark_workers.py --workers 1 2 4 --modes preload
+    python benchmark_workers.py --no-prebuilt      # every start fits TF-IDF
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from benchmark import RESULTS_DIR, ROOT, git_commit
+
+READY_LINE = "Application startup complete"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def children(pid: int) -> List[int]:
+    """Direct child processes of pid"""
+    result = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # Field 4 is the parent pid; the command name (field 2) may contain spaces
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            result.append(int(entry))
+    return sorted(result)
+
+
+def memory_mb(pid: int) -> Dict[str, float]:
+    """RSS and PSS of one process in MB"""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("Rss", "Pss"):
+                    values[key.lower()] = int(rest.split()[0]) / 1024
+    except OSError:
+        pass
+    if "rss" not in values:
+        with open(f"/proc/{pid}/statm") as f:
+            values["rss"] = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    values.setdefault("pss", values["rss"])
+    return values
+
+
+def wait_ready(log_path: Path, workers: int, process: subprocess.Popen, timeout: float) -> Optional[float]:
+    """Seconds until every worker logged startup completion (None on timeout/exit)"""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            return None
+        if log_path.read_text(errors="replace").count(READY_LINE) >= workers:
+            return time.perf_counter() - start
+        time.sleep(0.05)
+    return None
+
+
+def run(workers: int, preload: bool, prebuilt: bool, requests: int, timeout: float) -> Dict[str, Any]:
+    port = free_port()
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        WEB_CONCURRENCY=str(workers),
+        GUNICORN_PRELOAD="true" if preload else "false",
+        LLM_BACKEND=os.environ.get("LLM_BACKEND", "fake"),
+        FAKE_LLM_LATENCY_MS=os.environ.get("FAKE_LLM_LATENCY_MS", "5"),
+        PYTHONUNBUFFERED="1",
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if not prebuilt:
+            # An index path under a regular file can be neither loaded nor
+            # saved, so every process that loads the app fits TF-IDF itself
+            blocker = Path(tmp) / "no-index"
+            blocker.touch()
+            env["RAG_INDEX_DIR"] = str(blocker / "index")
+        log_path = Path(tmp) / "gunicorn.log"
+        with open(log_path, "w") as log:
+            process = subprocess.Popen(
+                [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"],
+                cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT
+            )
+            try:
+                startup = wait_ready(log_path, workers, process, timeout)
+                if startup is None:
+                    tail = log_path.read_text(errors="replace")[-2000:]
+                    raise SystemExit(f"[ERROR] {workers} workers did not start:\n{tail}")
+
+                # Touch the index in every worker so resident memory reflects serving
+                with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+                    for i in range(requests):
+                        client.post("/rag/query", json={"query": f"chest workout for beginners {i}"})
+
+                master = memory_mb(process.pid)
+                per_worker = [memory_mb(pid) for pid in children(process.pid)]
+            finally:
+                process.send_signal(signal.SIGTERM)
+                try:
+                    process.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    return {
+        "workers": workers,
+        "preload": preload,
+        "prebuilt_index": prebuilt,
+        "startup_s": startup,
+        "master": master,
+        "worker_rss_mb": sum(m["rss"] for m in per_worker) / len(per_worker),
+        "worker_pss_mb": sum(m["pss"] for m in per_worker) / len(per_worker),
+        "total_pss_mb": master["pss"] + sum(m["pss"] for m in per_worker),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Startup time and memory per worker under gunicorn")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--modes", nargs="+", choices=["preload", "fork"], default=["preload", "fork"],
+                        help="preload: master loads the index once; fork: every worker loads it")
+    parser.add_argument("--no-prebuilt", action="store_true", help="don't use the prebuilt index artifact")
+    parser.add_argument("--requests", type=int, default=50, help="queries sent before measuring memory")
+    parser.add_argument("--timeout", type=float, default=300, help="max seconds to wait for startup")
+    parser.add_argument("--output", type=Path, help="results file (default: benchmarks/results/workers_<time>_<commit>.json)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not Path("/proc/self/stat").exists():
+        raise SystemExit("[ERROR] benchmark_workers.py needs Linux /proc")
+
+    results = []
+    print(f"{'mode':<9}{'workers':>8}{'startup s':>11}{'RSS/worker':>12}{'PSS/worker':>12}{'total PSS':>11}")
+    print("-" * 63)
+    for mode in args.modes:
+        for workers in args.workers:
+            result = run(workers, mode == "preload", not args.no_prebuilt, args.requests, args.timeout)
+            results.append(result)
+            print(f"{mode:<9}{workers:>8}{result['startup_s']:>11.2f}{result['worker_rss_mb']:>12.1f}"
+                  f"{result['worker_pss_mb']:>12.1f}{result['total_pss_mb']:>11.1f}")
+
+    report = {
+        "results": results,
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": sys.version.split()[0],
+            "prebuilt_index": not args.no_prebuilt,
+        },
+    }
+    output = args.output
+    if output is None:
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+        output = RESULTS_DIR / f"workers_{stamp}_{report['meta']['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n[OK] Results saved to {output}")
@@ -0,0 +1,28 @@
+"""
+Build the prebuilt search index
+===============================
+Fits TF-IDF over data/*.json and writes the artifact that RAGSystem loads
+at startup (see index_store.py).
+
+Run with: python build_index.py
+Output goes to $RAG_INDEX_DIR (default: ./index).
+"""
+
+import sys
+import time
+
+import index_store
+from rag import RAGSystem
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    rag = RAGSystem(use_prebuilt_index=False)
+
+    manifest = index_store.read_manifest(rag.index_dir)
+    if manifest is None or manifest["fingerprint"] != index_store.data_fingerprint():
+        print("[ERROR] Index artifact was not written")
+        sys.exit(1)
+
+    print(f"[OK] Index v{manifest['version']} built in {time.perf_counter() - start:.2f}s "
+          f"({manifest['n_documents']} documents, {manifest['n_terms']} terms)")
@@ -0,0 +1,125 @@
+"""
+Context Packer
+==============
+Fits retrieved documents into a prompt token budget.
+
+Documents are "Label: value" lines (see RAGSystem._load_knowledge_base).
+Lines are packed in passes by field value: every document's name first,
+then key facts (muscle group, calories...), then descriptions, and last
+the verbose Instructions/Preparation text. Within a pass documents go in
+rank order, so when the budget runs out it is the low-ranked documents
+and low-value fields that are truncated or dropped. Free-text lines
+already included for another document are skipped.
+"""
+
+import re
+from typing import Dict, List, Tuple
+
+# Lower value = packed earlier. Unknown labels are treated as key facts.
+FIELD_PRIORITY: Dict[str, int] = {
+    "Exercise": 0, "Meal": 0, "Topic": 0,
+    "Muscle Group": 1, "Difficulty": 1, "Equipment": 1, "Type": 1, "Calories": 1,
+    "Protein": 1, "Good for": 1, "Category": 1, "Tip": 1,
+    "Sets": 2, "Description": 2, "Ingredients": 2,
+    "Instructions": 3, "Preparation": 3,
+}
+DEFAULT_PRIORITY = 1
+# Fields that are deduplicated across documents and may be cut mid-line
+FREE_TEXT_FIELDS = {"Description", "Tip", "Ingredients", "Instructions", "Preparation"}
+# Don't bother adding a truncated line with less room than this
+MIN_TRUNCATED_TOKENS = 12
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Fast local token estimate.
+
+    Counts words and punctuation marks, plus one extra token per 8 word
+    characters since long words split into several subword tokens.
+    Close enough to real tokenizers for budgeting; no model files needed.
+    """
+    pieces = _TOKEN_PATTERN.findall(text)
+    return len(pieces) + sum(len(piece) // 8 for piece in pieces)
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """Cut text at a word boundary so it fits in max_tokens (with an ellipsis)"""
+    words = text.split(" ")
+    kept = []
+    used = estimate_tokens("...")
+    for word in words:
+        cost = estimate_tokens(word)
+        if used + cost > max_tokens:
+            break
+        kept.append(word)
+        used += cost
+    return " ".join(kept).rstrip(" ,;:") + "..."
+
+
+def _parse(document: str) -> List[Tuple[str, str]]:
+    """Split a document into (label, line) pairs, skipping blank lines"""
+    lines = []
+    for line in document.strip().splitlines():
+        if line.strip():
+            label = line.partition(":")[0].strip()
+            lines.append((label, line.strip()))
+    return lines
+
+
+def pack_context(documents: List[str], max_tokens: int, separator: str = "\n---\n") -> str:
+    """
+    Greedily pack ranked documents into at most ~max_tokens tokens.
+
+    Documents whose name line doesn't fit are dropped; lower-value fields
+    of included documents are added while budget remains.
+    """
+    parsed = []
+    seen_docs = set()
+    for document in documents:
+        key = document.strip()
+        if key and key not in seen_docs:
+            seen_docs.add(key)
+            parsed.append(_parse(document))
+
+    separator_tokens = estimate_tokens(separator)
+    budget = max_tokens
+    selected: List[Dict[int, str]] = [{} for _ in parsed]
+    dropped = [False] * len(parsed)
+    seen_lines = set()
+
+    for priority in sorted(set(FIELD_PRIORITY.values()) | {DEFAULT_PRIORITY}):
+        for doc_index, lines in enumerate(parsed):
+            if dropped[doc_index]:
+                continue
+            for line_index, (label, line) in enumerate(lines):
+                if FIELD_PRIORITY.get(label, DEFAULT_PRIORITY) != priority:
+                    continue
+
+                free_text = label in FREE_TEXT_FIELDS
+                if free_text and line in seen_lines:
+                    continue
+
+                overhead = 1 if selected[doc_index] else 1 + separator_tokens  # newline, separator
+                cost = overhead + estimate_tokens(line)
+
+                if cost > budget:
+                    if priority == 0 and not selected[doc_index]:
+                        dropped[doc_index] = True
+                        break
+                    if not free_text or budget - overhead < MIN_TRUNCATED_TOKENS:
+                        continue
+                    line = _truncate(line, budget - overhead)
+                    cost = overhead + estimate_tokens(line)
+
+                selected[doc_index][line_index] = line
+                seen_lines.add(line)
+                budget -= cost
+
+    packed = []
+    for lines in selected:
+        if lines:
+            packed.append("\n".join(lines[i] for i in sorted(lines)))
+    return separator.join(packed)
+
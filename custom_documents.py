@@ -0,0 +1,122 @@
+"""
+Custom Documents
+================
+Exercises, meals and tips added through the API (coach-authored tips,
+user-created meals), kept in data/custom.json next to the curated data.
+
+The file is part of the data fingerprint, so a full rebuild (reload,
+merge or restart) indexes these documents like any other. Writes are a
+read-modify-write of one small JSON file under an exclusive file lock,
+replaced atomically, so several workers can write at the same time.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+DOCUMENT_TYPES = ("exercise", "meal", "tip")
+
+# Field -> expected kind per document type; missing or null fields are allowed
+FIELD_KINDS = {
+    "exercise": {
+        "name": "text", "muscle_group": "text", "difficulty": "text", "description": "text",
+        "instructions": "text", "sets": "a number", "reps": "text or a number", "equipment": "text",
+    },
+    "meal": {
+        "name": "text", "type": "text", "calories": "a number", "protein": "a number", "carbs": "a number",
+        "fat": "a number", "ingredients": "a list of text", "goal": "a list of text", "preparation": "text",
+    },
+    "tip": {"topic": "text", "category": "text", "content": "text"},
+}
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _has_kind(value: Any, kind: str) -> bool:
+    if kind == "text":
+        return isinstance(value, str)
+    if kind == "a number":
+        return _is_number(value)
+    if kind == "text or a number":
+        return isinstance(value, str) or _is_number(value)
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+
+def validate_document(doc_type: str, data: Dict[str, Any]) -> Optional[str]:
+    """Problem with a custom document's fields, or None if it can be indexed"""
+    if doc_type not in DOCUMENT_TYPES:
+        return f"type must be one of {', '.join(DOCUMENT_TYPES)}"
+    required = "content" if doc_type == "tip" else "name"
+    if not str(data.get(required) or "").strip():
+        return f"{doc_type} needs a non-empty '{required}'"
+    for field, kind in FIELD_KINDS[doc_type].items():
+        if data.get(field) is not None and not _has_kind(data[field], kind):
+            return f"'{field}' must be {kind}"
+    return None
+
+
+class CustomDocuments:
+    """data/custom.json: {"documents": [{"id", "type", "data"}, ...]}"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def load(self) -> List[Dict[str, Any]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f).get("documents", [])
+        except FileNotFoundError:
+            return []
+
+    def upsert(self, doc_id: str, doc_type: str, data: Dict[str, Any]) -> bool:
+        """Store a document; True if it replaced one with the same id"""
+        entry = {"id": doc_id, "type": doc_type, "data": data}
+
+        def apply(documents: List[Dict[str, Any]]) -> bool:
+            for i, document in enumerate(documents):
+                if document["id"] == doc_id:
+                    documents[i] = entry
+                    return True
+            documents.append(entry)
+            return False
+
+        return self._update(apply)
+
+    def delete(self, doc_id: str) -> bool:
+        """Remove a document; False if there was none with that id"""
+        def apply(documents: List[Dict[str, Any]]) -> bool:
+            for i, document in enumerate(documents):
+                if document["id"] == doc_id:
+                    del documents[i]
+                    return True
+            return False
+
+        return self._update(apply)
+
+    def _update(self, apply) -> bool:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        lock_path = self.path.with_name(self.path.name + ".lock")
+        with self._lock, open(lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            documents = self.load()
+            before = list(documents)
+            result = apply(documents)
+            if documents == before:
+                return result
+
+            tmp_path = self.path.with_name(f"{self.path.name}.tmp{os.getpid()}")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"documents": documents}, f, indent=2)
+            os.replace(tmp_path, self.path)
+            return result
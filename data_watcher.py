@@ -0,0 +1,109 @@
+"""
+Data Watcher
+============
+Polls the knowledge base files and triggers an index reload when they
+change, so content updates go live without a restart. A second watcher
+follows data/custom.json, which every worker writes for documents added
+through the API, and applies other workers' writes to this worker's index
+as delta updates rather than a rebuild.
+
+Polling file modification times is enough for three small JSON files and
+needs no extra dependency. A change is only acted on once the files have
+stayed the same for one more interval, so a reload never reads a file an
+editor or deploy script is still writing.
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+import index_store
+
+
+def _signature(paths: List[Path]) -> Tuple:
+    """(mtime, size) per file; missing files count as (None, None)"""
+    signature = []
+    for path in paths:
+        try:
+            stat = path.stat()
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((None, None))
+    return tuple(signature)
+
+
+class DataWatcher:
+    """Background thread calling on_change after the watched files change"""
+
+    def __init__(
+        self,
+        on_change: Callable[[], object],
+        paths: List[Path],
+        interval: float = 5.0,
+        action: str = "reloading index"
+    ):
+        self.on_change = on_change
+        self.paths = paths
+        self.interval = interval
+        self.action = action
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="data-watcher", daemon=True)
+            self._thread.start()
+            print(f"[OK] Watching {len(self.paths)} data files every {self.interval:g}s")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    def _run(self) -> None:
+        current = _signature(self.paths)
+        pending = None
+        while not self._stop.wait(self.interval):
+            signature = _signature(self.paths)
+            if signature == current:
+                pending = None
+                continue
+            if signature != pending:
+                # Changed since the last poll; wait for the files to settle
+                pending = signature
+                continue
+
+            current, pending = signature, None
+            print(f"[INFO] Data files changed, {self.action}")
+            try:
+                self.on_change()
+            except Exception as e:
+                print(f"[ERROR] {self.action.capitalize()} after data change failed: {e}")
+
+
+def create_data_watcher(on_change: Callable[[], object]) -> Optional[DataWatcher]:
+    """Build the data file watcher from environment settings (None unless enabled)"""
+    if os.getenv("RAG_WATCH_DATA", "false").lower() in ("0", "false", "no"):
+        return None
+
+    # custom.json has its own watcher (see create_document_watcher):
+    # reloading on it would rebuild every worker on every API write
+    paths = [
+        index_store.DATA_PATH / name for name in index_store.DATA_FILES if name != index_store.CUSTOM_FILE
+    ]
+    return DataWatcher(on_change, paths, float(os.getenv("RAG_WATCH_INTERVAL_SECONDS", "5")))
+
+
+def create_document_watcher(on_change: Callable[[], object]) -> Optional[DataWatcher]:
+    """Watcher for documents other workers write to data/custom.json (None if RAG_SYNC_DOCUMENTS is off)"""
+    if os.getenv("RAG_SYNC_DOCUMENTS", "true").lower() in ("0", "false", "no"):
+        return None
+
+    return DataWatcher(
+        on_change,
+        [index_store.DATA_PATH / index_store.CUSTOM_FILE],
+        float(os.getenv("RAG_SYNC_INTERVAL_SECONDS", "2")),
+        action="syncing custom documents"
+    )
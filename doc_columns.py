@@ -0,0 +1,292 @@
+"""
+Document Columns
+================
+Column-wise document metadata for filtered search.
+
+Each field is one NumPy array with a row per document (categorical fields
+as integer codes, multi-valued fields as bitmasks), so a filter such as
+"meals for build_muscle without dairy" becomes a few vectorized
+comparisons producing a boolean mask over the corpus.
+"""
+
+import copy
+import re
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+DOC_TYPES = ("exercise", "meal", "tip")
+DIFFICULTY_LEVELS = ("beginner", "intermediate", "advanced")
+
+# Request goals that don't appear verbatim in data/nutrition.json
+GOAL_ALIASES = {"maintain": "stay_fit", "maintenance": "stay_fit"}
+
+# Ingredient keywords -> dietary flag. Plant "milks"/"butters" are handled
+# by PLANT_PREFIXES so almond milk isn't treated as dairy.
+DIET_KEYWORDS = {
+    "meat": ("chicken", "beef", "turkey", "pork", "bacon", "ham", "lamb", "steak", "sausage"),
+    "fish": ("tuna", "salmon", "shrimp", "fish", "cod", "tilapia", "prawn", "sardine"),
+    "dairy": ("milk", "cheese", "yogurt", "whey", "butter", "cream", "parmesan", "feta"),
+    "egg": ("egg", "eggs"),
+    "gluten": ("bread", "wrap", "pasta", "granola", "wheat", "soy sauce", "flour", "couscous", "barley"),
+    "nuts": ("almond", "almonds", "walnut", "walnuts", "peanut", "cashew", "pecan", "nuts"),
+    "honey": ("honey",),
+}
+PLANT_PREFIXES = ("almond", "peanut", "oat", "soy", "coconut", "cashew", "rice")
+DIET_FLAGS = tuple(DIET_KEYWORDS)
+
+# Restriction -> flags a meal must not have
+RESTRICTIONS = {
+    "vegetarian": ("meat", "fish"),
+    "pescatarian": ("meat",),
+    "vegan": ("meat", "fish", "dairy", "egg", "honey"),
+    "gluten_free": ("gluten",),
+    "dairy_free": ("dairy",),
+    "lactose_free": ("dairy",),
+    "nut_free": ("nuts",),
+    "egg_free": ("egg",),
+}
+
+MAX_EQUIPMENT_OPTIONS = 4
+NO_OPTION = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+def normalize_equipment(name: str) -> str:
+    """Canonical equipment name ("Dumbbells " -> "dumbbell")"""
+    name = name.strip().lower()
+    return name[:-1] if name.endswith("s") else name
+
+
+def parse_equipment(text: str) -> List[List[str]]:
+    """
+    Parse an exercise's equipment string into alternative requirement sets.
+
+    "barbell, bench"       -> [["barbell", "bench"]]
+    "none or dumbbells"    -> [[], ["dumbbell"]]
+    "barbell (optional)"   -> [[], ["barbell"]]
+    """
+    text = (text or "none").lower()
+    options = []
+    if "(optional)" in text:
+        options.append([])
+        text = text.replace("(optional)", "")
+
+    for option in text.split(" or "):
+        items = [normalize_equipment(item) for item in option.split(",")]
+        options.append([item for item in items if item and item != "none"])
+    return options
+
+
+@lru_cache(maxsize=65536)
+def _ingredient_flags(ingredient: str) -> FrozenSet[str]:
+    ingredient = ingredient.lower()
+    words = set(re.findall(r"[a-z]+", ingredient))
+    plant_based = ingredient.split(" ")[0] in PLANT_PREFIXES
+    flags = set()
+    for flag, keywords in DIET_KEYWORDS.items():
+        if flag == "dairy" and plant_based:
+            continue
+        if any((keyword in ingredient) if " " in keyword else (keyword in words) for keyword in keywords):
+            flags.add(flag)
+    return frozenset(flags)
+
+
+def diet_flags(ingredients: Iterable[str]) -> List[str]:
+    """Dietary flags (meat, dairy, gluten...) implied by an ingredient list"""
+    flags = set()
+    for ingredient in ingredients:
+        flags |= _ingredient_flags(ingredient)
+    return sorted(flags)
+
+
+def _codes(values: List[Optional[str]], categories: List[str], dtype=np.int16) -> np.ndarray:
+    lookup = {category: i for i, category in enumerate(categories)}
+    return np.array([lookup.get(value, -1) for value in values], dtype=dtype)
+
+
+def _values(found: Iterable[str], base: Optional[List[str]]) -> List[str]:
+    """Sorted distinct values, after base's (whose codes stay valid) if given"""
+    if base is None:
+        return sorted(set(found))
+    known = set(base)
+    return list(base) + sorted(set(found) - known)
+
+
+def _bitmask(values: Iterable[str], bits: Dict[str, int]) -> int:
+    mask = 0
+    for value in values:
+        if value in bits:
+            mask |= 1 << bits[value]
+    return mask
+
+
+class DocumentColumns:
+    """Per-document metadata stored as NumPy columns"""
+
+    # Saved with the index artifact (see to_arrays)
+    ARRAYS = (
+        "doc_type", "difficulty", "muscle_group", "meal_type", "category",
+        "goal_mask", "diet_mask", "calories", "protein", "carbs", "fat", "equipment_options", "name_rank",
+    )
+    VALUES = ("muscle_groups", "meal_types", "categories", "goals", "equipment")
+
+    def __init__(self, doc_metadata: List[Dict[str, Any]], base: Optional["DocumentColumns"] = None):
+        """
+        Columns for doc_metadata. With base, value lists extend base's, so
+        values both know get the same codes and bits (see with_values).
+        """
+        self.n_docs = len(doc_metadata)
+
+        self.doc_type = _codes([m.get("type") for m in doc_metadata], list(DOC_TYPES)).astype(np.int8)
+        self.difficulty = _codes([m.get("difficulty") for m in doc_metadata], list(DIFFICULTY_LEVELS))
+
+        self.muscle_groups = _values(
+            (m["muscle_group"] for m in doc_metadata if m.get("muscle_group")), base and base.muscle_groups
+        )
+        self.muscle_group = _codes([m.get("muscle_group") for m in doc_metadata], self.muscle_groups)
+
+        self.meal_types = _values(
+            (m["meal_type"] for m in doc_metadata if m.get("meal_type")), base and base.meal_types
+        )
+        self.meal_type = _codes([m.get("meal_type") for m in doc_metadata], self.meal_types)
+
+        self.categories = _values(
+            (m["category"] for m in doc_metadata if m.get("category")), base and base.categories
+        )
+        self.category = _codes([m.get("category") for m in doc_metadata], self.categories)
+
+        self.goals = _values((goal for m in doc_metadata for goal in m.get("goal", [])), base and base.goals)
+
+        # Equipment: up to MAX_EQUIPMENT_OPTIONS alternative requirement sets
+        # per exercise, each a bitmask; NO_OPTION marks unused slots.
+        options_per_doc = [
+            parse_equipment(m.get("equipment", "none")) if m.get("type") == "exercise" else []
+            for m in doc_metadata
+        ]
+        self.equipment = _values(
+            (item for options in options_per_doc for option in options for item in option), base and base.equipment
+        )
+        self._init_bits()
+
+        self.goal_mask = np.array(
+            [_bitmask(m.get("goal", []), self._goal_bits) for m in doc_metadata], dtype=np.uint64
+        )
+        self.diet_mask = np.array(
+            [_bitmask(m.get("diet", []), self._diet_bits) for m in doc_metadata], dtype=np.uint64
+        )
+
+        self.calories = np.array(
+            [m.get("calories", np.nan) for m in doc_metadata], dtype=np.float32
+        )
+        # Grams per portion, read by the meal optimizer
+        self.protein = np.array([m.get("protein", np.nan) for m in doc_metadata], dtype=np.float32)
+        self.carbs = np.array([m.get("carbs", np.nan) for m in doc_metadata], dtype=np.float32)
+        self.fat = np.array([m.get("fat", np.nan) for m in doc_metadata], dtype=np.float32)
+
+        # Position of each document's name in sorted order (equal names share
+        # one), so planners can order candidates by name without decoding them
+        names = sorted({m["name"] for m in doc_metadata if m.get("name")})
+        self.name_rank = _codes([m.get("name") for m in doc_metadata], names, dtype=np.int32)
+
+        self.equipment_options = np.full((self.n_docs, MAX_EQUIPMENT_OPTIONS), NO_OPTION, dtype=np.uint64)
+        for row, options in enumerate(options_per_doc):
+            for slot, option in enumerate(options[:MAX_EQUIPMENT_OPTIONS]):
+                self.equipment_options[row, slot] = _bitmask(option, self._equipment_bits)
+
+    def _init_bits(self):
+        # Custom documents can add any goal: beyond 63 goals the rest share the
+        # last bit, so filtering on one of them also matches the others
+        self._goal_bits = {goal: min(i, 63) for i, goal in enumerate(self.goals)}
+        self._diet_bits = {flag: i for i, flag in enumerate(DIET_FLAGS)}
+        # Beyond 63 items everything else shares the last bit (conservatively "unavailable")
+        self._equipment_bits = {item: min(i, 63) for i, item in enumerate(self.equipment)}
+
+    def to_arrays(self) -> Tuple[Dict[str, np.ndarray], Dict[str, List[str]]]:
+        """(named arrays, value lists) for saving; see from_arrays"""
+        return (
+            {name: getattr(self, name) for name in self.ARRAYS},
+            {name: getattr(self, name) for name in self.VALUES},
+        )
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], values: Dict[str, List[str]]) -> "DocumentColumns":
+        """Columns saved by to_arrays, without re-deriving them from metadata"""
+        columns = cls.__new__(cls)
+        for name in cls.ARRAYS:
+            setattr(columns, name, arrays[name])
+        for name in cls.VALUES:
+            setattr(columns, name, values[name])
+        columns.n_docs = len(columns.doc_type)
+        columns._init_bits()
+        return columns
+
+    def with_values(self, other: "DocumentColumns") -> "DocumentColumns":
+        """
+        These columns with other's value lists, which must extend ours
+        (other built with base=self). Masks of the two then agree on which
+        filter values are unknown.
+        """
+        columns = copy.copy(self)
+        for name in self.VALUES:
+            setattr(columns, name, getattr(other, name))
+        columns._init_bits()
+        return columns
+
+    def mask(
+        self,
+        doc_type: Optional[str] = None,
+        max_difficulty: Optional[str] = None,
+        muscle_groups: Optional[List[str]] = None,
+        meal_types: Optional[List[str]] = None,
+        goals: Optional[List[str]] = None,
+        restrictions: Optional[List[str]] = None,
+        equipment: Optional[List[str]] = None,
+        max_calories: Optional[float] = None
+    ) -> np.ndarray:
+        """
+        Boolean mask of documents matching every given filter.
+
+        Unknown values (a goal or restriction not present in the data) are
+        ignored rather than excluding everything.
+        """
+        keep = np.ones(self.n_docs, dtype=bool)
+
+        if doc_type in DOC_TYPES:
+            keep &= self.doc_type == DOC_TYPES.index(doc_type)
+
+        if max_difficulty in DIFFICULTY_LEVELS:
+            keep &= self.difficulty <= DIFFICULTY_LEVELS.index(max_difficulty)
+
+        if muscle_groups:
+            codes = [self.muscle_groups.index(g) for g in muscle_groups if g in self.muscle_groups]
+            if codes:
+                keep &= np.isin(self.muscle_group, codes)
+
+        if meal_types:
+            codes = [self.meal_types.index(t) for t in meal_types if t in self.meal_types]
+            if codes:
+                keep &= np.isin(self.meal_type, codes)
+
+        if goals:
+            wanted = _bitmask((GOAL_ALIASES.get(g, g) for g in goals), self._goal_bits)
+            if wanted:
+                keep &= (self.goal_mask & np.uint64(wanted)) != 0
+
+        if restrictions:
+            forbidden = [flag for r in restrictions for flag in RESTRICTIONS.get(r.strip().lower(), ())]
+            forbidden_mask = _bitmask(forbidden, self._diet_bits)
+            if forbidden_mask:
+                keep &= (self.diet_mask & np.uint64(forbidden_mask)) == 0
+
+        if equipment is not None:
+            available = _bitmask((normalize_equipment(e) for e in equipment), self._equipment_bits)
+            missing = self.equipment_options & ~np.uint64(available)
+            usable = (missing == 0) & (self.equipment_options != NO_OPTION)
+            is_exercise = self.doc_type == DOC_TYPES.index("exercise")
+            keep &= ~is_exercise | usable.any(axis=1)
+
+        if max_calories is not None:
+            keep &= ~(self.calories > max_calories)
+
+        return keep
@@ -0,0 +1,327 @@
+"""
+Document Store
+==============
+Compact, column-oriented storage for the indexed knowledge base.
+
+Instead of one formatted string and one metadata dict per document, the
+store keeps each document type's source fields as columns:
+
+- low-cardinality fields (muscle group, difficulty, meal type, category,
+  goals...) as integer codes into a small list of distinct values
+- free text (descriptions, instructions, preparation, tips) as one UTF-8
+  byte buffer per field with an offsets array, Arrow-style
+
+Only the fields the document formatters read are kept. Document text and
+metadata are rendered on demand from a row's fields by the same
+formatters used when indexing, so a rendered document is identical to
+the text that was indexed. All columns are plain NumPy arrays, saved with
+the index artifact and loaded memory-mapped.
+"""
+
+import json
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from doc_columns import DOC_TYPES, diet_flags
+
+
+def exercise_text(exercise: Dict[str, Any]) -> str:
+    """Indexed text for one exercise from workouts.json"""
+    return f"""
+Exercise: {exercise['name']}
+Muscle Group: {exercise.get('muscle_group', 'N/A')}
+Difficulty: {exercise.get('difficulty', 'N/A')}
+Description: {exercise.get('description', '')}
+Instructions: {exercise.get('instructions', '')}
+Sets: {exercise.get('sets', 'N/A')} | Reps: {exercise.get('reps', 'N/A')}
+Equipment: {exercise.get('equipment', 'None')}
+"""
+
+
+def exercise_metadata(exercise: Dict[str, Any]) -> Dict[str, Any]:
+    """Filterable metadata for one exercise"""
+    return {
+        "type": "exercise",
+        "name": exercise['name'],
+        "muscle_group": exercise.get('muscle_group'),
+        "difficulty": exercise.get('difficulty'),
+        "equipment": exercise.get('equipment', 'none'),
+        "sets": exercise.get('sets'),
+        "reps": exercise.get('reps')
+    }
+
+
+def meal_text(meal: Dict[str, Any]) -> str:
+    """Indexed text for one meal from nutrition.json"""
+    return f"""
+Meal: {meal['name']}
+Type: {meal.get('type', 'N/A')}
+Calories: {meal.get('calories', 'N/A')} kcal
+Protein: {meal.get('protein', 'N/A')}g | Carbs: {meal.get('carbs', 'N/A')}g | Fat: {meal.get('fat', 'N/A')}g
+Ingredients: {', '.join(meal.get('ingredients', []))}
+Good for: {', '.join(meal.get('goal', []))}
+Preparation: {meal.get('preparation', '')}
+"""
+
+
+def meal_metadata(meal: Dict[str, Any]) -> Dict[str, Any]:
+    """Filterable metadata for one meal"""
+    return {
+        "type": "meal",
+        "name": meal['name'],
+        "meal_type": meal.get('type'),
+        "goal": meal.get('goal', []),
+        "diet": diet_flags(meal.get('ingredients', [])),
+        "calories": meal.get('calories'),
+        "protein": meal.get('protein'),
+        "carbs": meal.get('carbs'),
+        "fat": meal.get('fat'),
+        "ingredients": meal.get('ingredients', [])
+    }
+
+
+def tip_text(tip: Dict[str, Any]) -> str:
+    """Indexed text for one tip from tips.json"""
+    return f"""
+Topic: {tip.get('topic', 'General')}
+Category: {tip.get('category', 'general')}
+Tip: {tip['content']}
+"""
+
+
+def tip_metadata(tip: Dict[str, Any]) -> Dict[str, Any]:
+    """Filterable metadata for one tip"""
+    return {
+        "type": "tip",
+        "topic": tip.get('topic', ''),
+        "category": tip.get('category')
+    }
+
+
+# Document type -> (indexed text, metadata) formatters for a source record
+DOCUMENT_FORMATTERS = {
+    "exercise": (exercise_text, exercise_metadata),
+    "meal": (meal_text, meal_metadata),
+    "tip": (tip_text, tip_metadata),
+}
+
+
+def format_document(doc_type: str, record: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """Indexed text and metadata for one source record"""
+    text, metadata = DOCUMENT_FORMATTERS[doc_type]
+    return text(record), metadata(record)
+
+
+# Source fields each formatter reads; everything else in a record is dropped
+DOCUMENT_FIELDS = {
+    "exercise": ("name", "muscle_group", "difficulty", "description", "instructions", "sets", "reps", "equipment"),
+    "meal": ("name", "type", "calories", "protein", "carbs", "fat", "ingredients", "goal", "preparation"),
+    "tip": ("topic", "category", "content"),
+}
+
+# A field is stored as codes when it has at most this many distinct values
+# and values repeat (at most one distinct value per two rows); names,
+# descriptions and other unique text go into the byte buffer
+MAX_CATEGORIES = 4096
+
+
+class TextColumn:
+    """Variable-length values: row i is data[offsets[i]:offsets[i + 1]] (empty = missing)"""
+
+    kind = "text"
+
+    def __init__(self, offsets: np.ndarray, data: np.ndarray):
+        self.offsets = offsets
+        self.data = data
+
+    def get(self, row: int) -> Optional[str]:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return self.data[start:end].tobytes().decode("utf-8") if end > start else None
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {"offsets": self.offsets, "data": self.data}
+
+    @property
+    def nbytes(self) -> int:
+        return self.offsets.nbytes + self.data.nbytes
+
+
+class CategoryColumn:
+    """Interned values: row i is categories[codes[i]] (-1 = missing)"""
+
+    kind = "category"
+
+    def __init__(self, codes: np.ndarray, categories: List[str]):
+        self.codes = codes
+        self.categories = categories
+
+    def get(self, row: int) -> Optional[str]:
+        code = self.codes[row]
+        return self.categories[code] if code >= 0 else None
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {"codes": self.codes}
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + sum(len(c.encode("utf-8")) for c in self.categories)
+
+
+class _ColumnBuilder:
+    """Appends encoded values as text, interning them as well until there are too many distinct ones"""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array("q", [0])
+        self.lookup: Optional[Dict[str, int]] = {}
+        self.codes = array("i")
+
+    def append(self, value: Optional[str]):
+        if value is not None:
+            self.data += value.encode("utf-8")
+        self.offsets.append(len(self.data))
+
+        if self.lookup is None:
+            return
+        if value is None:
+            self.codes.append(-1)
+            return
+        code = self.lookup.setdefault(value, len(self.lookup))
+        if len(self.lookup) > MAX_CATEGORIES:
+            self.lookup, self.codes = None, None
+        else:
+            self.codes.append(code)
+
+    def finish(self):
+        n_rows = len(self.offsets) - 1
+        if self.lookup is not None and len(self.lookup) * 2 <= n_rows:
+            codes = np.frombuffer(self.codes, dtype=np.int32)
+            dtype = np.int16 if len(self.lookup) < 2 ** 15 else np.int32
+            return CategoryColumn(codes.astype(dtype), list(self.lookup))
+        return TextColumn(np.frombuffer(self.offsets, dtype=np.int64), np.frombuffer(self.data, dtype=np.uint8))
+
+
+class DocumentStore:
+    """
+    All indexed documents, in index order.
+
+    Rows are addressed through doc_type (code into DOC_TYPES) and row
+    (position within that type's columns). ids maps API-managed document
+    ids to their index.
+    """
+
+    def __init__(
+        self,
+        doc_type: np.ndarray,
+        row: np.ndarray,
+        tables: Dict[str, Dict[str, Any]],
+        ids: Optional[Dict[str, int]] = None
+    ):
+        self.doc_type = doc_type
+        self.row = row
+        self.tables = tables
+        self.ids = ids or {}
+        self._id_of = {index: doc_id for doc_id, index in self.ids.items()}
+
+    @classmethod
+    def build(cls, entries: Iterable[Tuple[str, Dict[str, Any], Optional[str]]]) -> "DocumentStore":
+        """Store (doc_type, source record, id or None) entries, streamed once"""
+        builders = {t: {field: _ColumnBuilder() for field in DOCUMENT_FIELDS[t]} for t in DOC_TYPES}
+        counts = {t: 0 for t in DOC_TYPES}
+        doc_types, rows = array("b"), array("i")
+        ids = {}
+
+        for doc_type, record, doc_id in entries:
+            for field, builder in builders[doc_type].items():
+                builder.append(json.dumps(record[field], ensure_ascii=False) if field in record else None)
+            if doc_id:
+                ids[doc_id] = len(doc_types)
+            doc_types.append(DOC_TYPES.index(doc_type))
+            rows.append(counts[doc_type])
+            counts[doc_type] += 1
+
+        tables = {
+            t: {field: builder.finish() for field, builder in builders[t].items()}
+            for t in DOC_TYPES if counts[t]
+        }
+        return cls(np.frombuffer(doc_types, dtype=np.int8), np.frombuffer(rows, dtype=np.int32), tables, ids)
+
+    def __len__(self) -> int:
+        return len(self.doc_type)
+
+    def record(self, index: int) -> Tuple[str, Dict[str, Any]]:
+        """(doc_type, source fields) of one document"""
+        doc_type = DOC_TYPES[self.doc_type[index]]
+        row = int(self.row[index])
+        record = {}
+        for field, column in self.tables[doc_type].items():
+            value = column.get(row)
+            if value is not None:
+                record[field] = json.loads(value)
+        return doc_type, record
+
+    def document(self, index: int) -> str:
+        """Indexed text of one document"""
+        doc_type, record = self.record(index)
+        return DOCUMENT_FORMATTERS[doc_type][0](record)
+
+    def metadata(self, index: int) -> Dict[str, Any]:
+        doc_type, record = self.record(index)
+        meta = DOCUMENT_FORMATTERS[doc_type][1](record)
+        if index in self._id_of:
+            meta["id"] = self._id_of[index]
+        return meta
+
+    def documents(self) -> Iterator[str]:
+        """Every document's text, rendered one at a time"""
+        for index in range(len(self)):
+            yield self.document(index)
+
+    def iter_metadata(self) -> Iterator[Dict[str, Any]]:
+        for index in range(len(self)):
+            yield self.metadata(index)
+
+    @property
+    def nbytes(self) -> int:
+        columns = sum(c.nbytes for table in self.tables.values() for c in table.values())
+        return self.doc_type.nbytes + self.row.nbytes + columns
+
+    def to_arrays(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """(named arrays, JSON-serialisable layout) for saving; see from_arrays"""
+        arrays = {"doc_type": self.doc_type, "row": self.row}
+        columns = {}
+        for doc_type, table in self.tables.items():
+            columns[doc_type] = {}
+            for field, column in table.items():
+                for part, values in column.arrays().items():
+                    arrays[f"{doc_type}.{field}.{part}"] = values
+                layout = {"kind": column.kind}
+                if column.kind == "category":
+                    layout["categories"] = column.categories
+                columns[doc_type][field] = layout
+        return arrays, {"columns": columns, "ids": self.ids}
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], layout: Dict[str, Any]) -> "DocumentStore":
+        tables = {}
+        for doc_type, fields in layout["columns"].items():
+            tables[doc_type] = {}
+            for field, column in fields.items():
+                prefix = f"{doc_type}.{field}"
+                if column["kind"] == "category":
+                    tables[doc_type][field] = CategoryColumn(arrays[f"{prefix}.codes"], column["categories"])
+                else:
+                    tables[doc_type][field] = TextColumn(arrays[f"{prefix}.offsets"], arrays[f"{prefix}.data"])
+        return cls(arrays["doc_type"], arrays["row"], tables, layout.get("ids"))
+
+    @staticmethod
+    def array_names(layout: Dict[str, Any]) -> List[str]:
+        """Names of the arrays to_arrays produced for this layout"""
+        names = ["doc_type", "row"]
+        for doc_type, fields in layout["columns"].items():
+            for field, column in fields.items():
+                parts = ("codes",) if column["kind"] == "category" else ("offsets", "data")
+                names += [f"{doc_type}.{field}.{part}" for part in parts]
+        return names
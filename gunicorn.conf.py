@@ -0,0 +1,43 @@
+"""
+Gunicorn configuration - multi-worker deployment
+================================================
+Run with: gunicorn -c gunicorn.conf.py main:app
+
+With preload_app the master imports main.py once, so the RAG index is
+loaded a single time and workers fork afterwards. The read-only index
+(documents, vocabulary, postings) then lives in copy-on-write pages shared
+by every worker instead of being rebuilt and duplicated per process.
+gc.freeze() moves those objects out of the collector's reach so garbage
+collection in a worker doesn't write to (and un-share) their pages.
+
+Settings (env):
+    PORT               listen port (default 8000)
+    WEB_CONCURRENCY    number of workers (default 1)
+    GUNICORN_PRELOAD   "false" to load the app in each worker instead
+
+With preload_app the index is loaded before the port is bound (RAG_WARMUP
+defaults to "eager" so workers fork with it in place); without it every
+worker binds at once and loads the index in the background.
+"""
+
+import gc
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() not in ("0", "false", "no")
+if preload_app:
+    os.environ.setdefault("RAG_WARMUP", "eager")
+
+# Plan requests can wait on the LLM for a while
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+
+def when_ready(server):
+    """Runs in the master after the app is preloaded, before workers fork"""
+    if preload_app:
+        gc.freeze()
+        server.log.info("Froze %d preloaded objects for copy-on-write sharing", gc.get_freeze_count())
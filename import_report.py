@@ -0,0 +1,105 @@
+"""
+Import-time report: where process startup goes before the app can serve
+=======================================================================
+Runs `python -X importtime -c "import main"` in a fresh interpreter and
+groups the self time of every imported module by top-level package, so a
+heavy dependency sneaking back into the startup path shows up at once.
+
+Examples:
+    python import_report.py
+    python import_report.py --module rag --top 15
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict
+
+from benchmark import RESULTS_DIR, ROOT, git_commit
+
+# Modules that should only be imported when actually needed
+LAZY_MODULES = ["sklearn", "google.genai"]
+
+
+def import_times(module: str) -> Dict[str, Any]:
+    """Self time per module (us) and wall time of importing module in a new process"""
+    probe = (
+        "import sys, time, json\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "wall = time.perf_counter() - start\n"
+        f"print(json.dumps({{'wall': wall, 'loaded': [m for m in {LAZY_MODULES!r} if m in sys.modules]}}))\n"
+    )
+    env = dict(os.environ, LLM_BACKEND=os.environ.get("LLM_BACKEND", "fake"))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"[ERROR] import {module} failed:\n{result.stderr[-2000:]}")
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(self_us)
+    summary = json.loads(result.stdout.strip().splitlines()[-1])
+    return {"modules": modules, **summary}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Import time by top-level package")
+    parser.add_argument("--module", default="main", help="module to import (default: main)")
+    parser.add_argument("--top", type=int, default=10, help="packages to show")
+    parser.add_argument("--output", type=Path, help="results file (default: benchmarks/results/imports_<time>_<commit>.json)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    result = import_times(args.module)
+
+    packages: Dict[str, int] = defaultdict(int)
+    for name, self_us in result["modules"].items():
+        packages[name.split(".")[0]] += self_us
+    total_us = sum(packages.values())
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+
+    print(f"{'package':<24}{'ms':>10}{'%':>8}")
+    print("-" * 42)
+    for package, self_us in ranked[:args.top]:
+        print(f"{package:<24}{self_us / 1000:>10.1f}{100 * self_us / total_us:>8.1f}")
+    print("-" * 42)
+    print(f"{'total (self)':<24}{total_us / 1000:>10.1f}")
+    print(f"\n[OK] import {args.module}: {result['wall'] * 1000:.0f} ms wall, {len(result['modules'])} modules")
+    if result["loaded"]:
+        print(f"[WARNING] Imported at startup: {', '.join(result['loaded'])}")
+    else:
+        print(f"[OK] Not imported at startup: {', '.join(LAZY_MODULES)}")
+
+    report = {
+        "module": args.module,
+        "wall_s": result["wall"],
+        "packages_ms": {package: self_us / 1000 for package, self_us in ranked},
+        "lazy_modules_loaded": result["loaded"],
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": sys.version.split()[0],
+        },
+    }
+    output = args.output
+    if output is None:
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+        output = RESULTS_DIR / f"imports_{stamp}_{report['meta']['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"[OK] Results saved to {output}")
@@ -0,0 +1,242 @@
+"""
+Index Snapshot
+==============
+One complete, immutable version of the search index: document store,
+metadata columns, query vectorizer and postings.
+
+RAGSystem keeps the live index in a single attribute holding a snapshot.
+A reload builds the next snapshot on the side and swaps it in with one
+assignment, so a request that already picked up the old snapshot keeps a
+consistent view until it finishes, and no request sees a half-built index.
+
+Documents added, updated or deleted through the API don't refit the base
+index. They produce a new snapshot sharing the base with a small delta
+segment: the added documents' weights (over the base vocabulary and IDF)
+and tombstones for replaced or deleted base documents. Words of an added
+document that the vocabulary lacks are appended to it as delta-only
+terms, so they match at once. Queries score the base postings and the
+delta and merge the results; a background merge later refits everything,
+which also brings the vocabulary and IDF up to date.
+
+Document indices run over the base first, then the delta.
+"""
+
+import copy
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from doc_columns import DocumentColumns
+from document_store import DocumentStore
+from query_cache import create_query_cache
+from search_engine import InvertedIndex, top_k
+
+
+class IndexSnapshot:
+    """Everything a search needs, built together and never modified afterwards"""
+
+    def __init__(
+        self,
+        store: DocumentStore,
+        vectorizer: Any,
+        tfidf_matrix: sparse.csr_matrix,
+        search_index: InvertedIndex,
+        fingerprint: str,
+        generation: int = 0,
+        doc_columns: Optional[DocumentColumns] = None
+    ):
+        self.store = store
+        # Saved with the artifact; derived from the rendered metadata after a fresh build
+        self.doc_columns = doc_columns or DocumentColumns(list(store.iter_metadata()))
+        self.vectorizer = vectorizer
+        self.tfidf_matrix = tfidf_matrix
+        self.search_index = search_index
+        self.fingerprint = fingerprint
+        self.generation = generation
+        self.created_at = time.time()
+        # Query vectors and results for repeated query text (see query_cache.py)
+        self.query_cache = create_query_cache(vectorizer.lowercase)
+
+        # API-managed documents in the base, by id
+        self.id_rows = store.ids
+
+        # Delta segment (empty until the first write)
+        self.deleted = np.zeros(len(store), dtype=bool)
+        self.delta_ids: List[str] = []
+        self.delta_documents: List[str] = []
+        self.delta_metadata: List[Dict[str, Any]] = []
+        self.delta_weights = sparse.csr_matrix((0, search_index.n_terms), dtype=np.float32)
+        self.delta_columns = DocumentColumns([], base=self.doc_columns)
+        # Base columns with the delta's value lists, so a filter value only
+        # delta documents have excludes base documents instead of being ignored
+        self._base_filter_columns = self.doc_columns
+        self._doc_term_matrix = None
+
+    @property
+    def n_base(self) -> int:
+        return len(self.store)
+
+    @property
+    def n_docs(self) -> int:
+        return len(self.store) + len(self.delta_documents)
+
+    @property
+    def n_terms(self) -> int:
+        """Vocabulary size: the base postings' terms, then any delta-only terms"""
+        return len(self.vectorizer.vocabulary_)
+
+    @property
+    def has_delta(self) -> bool:
+        return bool(self.delta_documents) or bool(self.deleted.any())
+
+    def document(self, index: int) -> str:
+        return self.store.document(index) if index < self.n_base else self.delta_documents[index - self.n_base]
+
+    def metadata(self, index: int) -> Dict[str, Any]:
+        return self.store.metadata(index) if index < self.n_base else self.delta_metadata[index - self.n_base]
+
+    def column(self, name: str, rows: np.ndarray) -> np.ndarray:
+        """A DocumentColumns array's values for document indices spanning the base and the delta"""
+        base = rows < self.n_base
+        column = getattr(self.doc_columns, name)
+        values = np.empty((len(rows),) + column.shape[1:], dtype=column.dtype)
+        values[base] = column[rows[base]]
+        values[~base] = getattr(self.delta_columns, name)[rows[~base] - self.n_base]
+        return values
+
+    def labels(self, name: str, values: str, rows: np.ndarray) -> np.ndarray:
+        """Category labels ("" if missing) of a coded DocumentColumns array for base and delta indices"""
+        base = rows < self.n_base
+        # Code -1 (missing) picks the trailing ""
+        tables = [np.array(list(getattr(columns, values)) + [""]) for columns in (self.doc_columns, self.delta_columns)]
+        labels = np.empty(len(rows), dtype=np.result_type(*tables))
+        labels[base] = tables[0][getattr(self.doc_columns, name)[rows[base]]]
+        labels[~base] = tables[1][getattr(self.delta_columns, name)[rows[~base] - self.n_base]]
+        return labels
+
+    def contains(self, doc_id: str) -> bool:
+        return doc_id in self.delta_ids or (doc_id in self.id_rows and not self.deleted[self.id_rows[doc_id]])
+
+    def api_documents(self) -> Dict[str, int]:
+        """Document index of every live API-managed document, by id"""
+        rows = {doc_id: row for doc_id, row in self.id_rows.items() if not self.deleted[row]}
+        rows.update((doc_id, self.n_base + i) for i, doc_id in enumerate(self.delta_ids))
+        return rows
+
+    def upsert(self, doc_id: str, document: str, metadata: Dict[str, Any], weights: sparse.spmatrix) -> "IndexSnapshot":
+        """New snapshot with doc_id added (or replaced); weights is its 1 x terms row"""
+        snapshot = self.delete(doc_id)
+        snapshot.delta_ids = snapshot.delta_ids + [doc_id]
+        snapshot.delta_documents = snapshot.delta_documents + [document]
+        snapshot.delta_metadata = snapshot.delta_metadata + [metadata]
+        snapshot.delta_weights = sparse.vstack(
+            [snapshot.delta_weights, sparse.csr_matrix(weights, dtype=np.float32)], format="csr"
+        )
+        snapshot._set_delta_columns()
+        return snapshot
+
+    def extend_vocabulary(self, terms: List[str], idf: np.ndarray) -> "IndexSnapshot":
+        """New snapshot whose vectorizer also knows terms (with these IDF weights), which only delta documents have"""
+        snapshot = copy.copy(self)
+        vectorizer = copy.copy(self.vectorizer)
+        vectorizer.vocabulary_ = {**self.vectorizer.vocabulary_, **{term: self.n_terms + i for i, term in enumerate(terms)}}
+        vectorizer.idf_ = np.concatenate([self.vectorizer.idf_, idf])
+        snapshot.vectorizer = vectorizer
+
+        delta_weights = self.delta_weights.copy()
+        delta_weights.resize((delta_weights.shape[0], snapshot.n_terms))
+        snapshot.delta_weights = delta_weights
+        snapshot._doc_term_matrix = None
+        # Cached query vectors lack the new terms
+        snapshot.query_cache = create_query_cache(vectorizer.lowercase)
+        return snapshot
+
+    def delete(self, doc_id: str) -> "IndexSnapshot":
+        """New snapshot without doc_id (unchanged copy if it isn't indexed)"""
+        snapshot = copy.copy(self)
+        snapshot._doc_term_matrix = None
+        # Same vocabulary, different documents: vectors stay valid, results don't
+        if self.query_cache is not None:
+            snapshot.query_cache = self.query_cache.without_results()
+        if doc_id in self.id_rows and not self.deleted[self.id_rows[doc_id]]:
+            snapshot.deleted = self.deleted.copy()
+            snapshot.deleted[self.id_rows[doc_id]] = True
+        if doc_id in self.delta_ids:
+            keep = [i for i, delta_id in enumerate(self.delta_ids) if delta_id != doc_id]
+            snapshot.delta_ids = [self.delta_ids[i] for i in keep]
+            snapshot.delta_documents = [self.delta_documents[i] for i in keep]
+            snapshot.delta_metadata = [self.delta_metadata[i] for i in keep]
+            snapshot.delta_weights = self.delta_weights[keep]
+            snapshot._set_delta_columns()
+        return snapshot
+
+    def _set_delta_columns(self):
+        # Only called on a new snapshot before it is returned
+        self.delta_columns = DocumentColumns(self.delta_metadata, base=self.doc_columns)
+        self._base_filter_columns = self.doc_columns.with_values(self.delta_columns)
+
+    def mask(self, filters: Optional[Dict[str, Any]] = None) -> Optional[np.ndarray]:
+        """Live documents matching filters (see DocumentColumns.mask), or None if every document qualifies"""
+        if not filters and not self.deleted.any():
+            return None
+        base = self._base_filter_columns.mask(**filters) if filters else np.ones(self.n_base, dtype=bool)
+        delta = self.delta_columns.mask(**filters) if filters else np.ones(len(self.delta_documents), dtype=bool)
+        return np.concatenate([base & ~self.deleted, delta])
+
+    def search(
+        self,
+        query_weights: sparse.spmatrix,
+        k: int,
+        min_score: float = 0.0,
+        doc_mask: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """Top k (doc_index, score) over the base postings and the delta segment"""
+        if doc_mask is None and self.deleted.any():
+            doc_mask = self.mask()
+        base_mask = doc_mask[:self.n_base] if doc_mask is not None else None
+        base_query = query_weights
+        if self.n_terms > self.search_index.n_terms:
+            # Delta-only terms have no postings in the base
+            base_query = sparse.csr_matrix(query_weights)[:, :self.search_index.n_terms]
+        hits = self.search_index.search(base_query, k, min_score=min_score, doc_mask=base_mask)
+        if not self.delta_documents:
+            return hits
+
+        # The delta is small: score it with one sparse product
+        scores = np.asarray((self.delta_weights @ sparse.csr_matrix(query_weights).T).todense()).ravel()
+        keep = scores > min_score
+        if doc_mask is not None:
+            keep &= doc_mask[self.n_base:]
+        doc_ids = np.concatenate([
+            np.array([doc for doc, _ in hits], dtype=np.int64), np.flatnonzero(keep) + self.n_base
+        ])
+        all_scores = np.concatenate([np.array([score for _, score in hits]), scores[keep]])
+        doc_ids, all_scores = top_k(doc_ids, all_scores, k)
+        return list(zip(doc_ids.tolist(), all_scores.tolist()))
+
+    @property
+    def doc_term_matrix(self) -> sparse.spmatrix:
+        """(documents x terms) weights including the delta, deleted rows zeroed (for batch search)"""
+        if not self.has_delta and self.n_terms == self.search_index.n_terms:
+            return self.search_index.doc_term_matrix
+        if self._doc_term_matrix is None:
+            base = self.search_index.doc_term_matrix.tocsr()
+            base.resize((base.shape[0], self.n_terms))
+            matrix = sparse.vstack([base, self.delta_weights], format="csr")
+            live = np.concatenate([~self.deleted, np.ones(len(self.delta_documents), dtype=bool)])
+            self._doc_term_matrix = sparse.diags(live.astype(np.float32)) @ matrix
+        return self._doc_term_matrix
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "generation": self.generation,
+            "documents": self.n_docs - int(self.deleted.sum()),
+            "terms": self.n_terms,
+            "delta_documents": len(self.delta_documents),
+            "deleted_documents": int(self.deleted.sum()),
+            "fingerprint": self.fingerprint[:12],
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.created_at)),
+            "query_cache": self.query_cache.stats() if self.query_cache is not None else None,
+        }
@@ -0,0 +1,212 @@
+"""
+Index Store
+===========
+Saves and loads the prebuilt search index so processes don't re-fit
+TF-IDF on every start.
+
+Artifact layout (one directory):
+    manifest.json      version, data fingerprint, vectorizer and ranking settings
+    vocabulary.json    terms, ordered by column index
+    documents.json     document store layout (column kinds, category
+                       values, API document ids) and filter column values
+    *.npy              IDF weights, CSR matrix and postings arrays
+                       (loaded memory-mapped); the postings hold TF-IDF
+                       or BM25 weights depending on the ranking mode
+    doc.*.npy          document store columns (see document_store.py)
+    filter.*.npy       metadata filter columns (see doc_columns.py); both
+                       memory-mapped, and only ever read
+
+Build it offline with `python build_index.py`.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+from scipy import sparse
+from doc_columns import DocumentColumns
+from document_store import DocumentStore
+from search_engine import InvertedIndex
+from text_vectorizer import QueryVectorizer
+
+# Bump whenever the artifact layout or document formatting changes
+ARTIFACT_VERSION = 7
+
+DATA_PATH = Path(__file__).parent / "data"
+DEFAULT_INDEX_DIR = Path(__file__).parent / "index"
+# Documents added through the API (see custom_documents.py)
+CUSTOM_FILE = "custom.json"
+# .jsonl variants hold large exports (see ingest.py)
+DATA_FILES = (
+    "workouts.json", "workouts.jsonl",
+    "nutrition.json", "nutrition.jsonl",
+    "tips.json", "tips.jsonl",
+    CUSTOM_FILE,
+)
+
+ARRAY_FILES = (
+    "idf",
+    "tfidf_data", "tfidf_indices", "tfidf_indptr",
+    "postings_ptr", "postings_docs", "postings_weights",
+)
+
+
+def data_fingerprint(data_path: Path = DATA_PATH) -> str:
+    """Content hash of the knowledge base files"""
+    digest = hashlib.sha256()
+    for name in DATA_FILES:
+        path = data_path / name
+        if path.exists():
+            digest.update(name.encode("utf-8"))
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+    return digest.hexdigest()
+
+
+def save_index(
+    index_dir: Path,
+    fingerprint: str,
+    store: DocumentStore,
+    doc_columns: DocumentColumns,
+    vectorizer: Any,
+    tfidf_matrix: sparse.csr_matrix,
+    search_index: InvertedIndex,
+    ranking: Optional[Dict[str, Any]] = None
+) -> None:
+    """Write the index artifact, replacing any previous one"""
+    index_dir = Path(index_dir)
+    # Per-process scratch dir: several workers may rebuild after the same data change
+    tmp_dir = index_dir.with_name(f"{index_dir.name}.tmp{os.getpid()}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    tfidf_matrix = sparse.csr_matrix(tfidf_matrix, dtype=np.float32)
+    arrays = {
+        "idf": vectorizer.idf_,
+        "tfidf_data": tfidf_matrix.data,
+        "tfidf_indices": tfidf_matrix.indices,
+        "tfidf_indptr": tfidf_matrix.indptr,
+        "postings_ptr": search_index.postings_ptr,
+        "postings_docs": search_index.postings_docs,
+        "postings_weights": search_index.postings_weights,
+    }
+    for name, array in arrays.items():
+        np.save(tmp_dir / f"{name}.npy", np.ascontiguousarray(array))
+
+    with open(tmp_dir / "vocabulary.json", "w", encoding="utf-8") as f:
+        json.dump(vectorizer.get_feature_names_out().tolist(), f)
+
+    store_arrays, layout = store.to_arrays()
+    for name, array in store_arrays.items():
+        np.save(tmp_dir / f"doc.{name}.npy", np.ascontiguousarray(array))
+    filter_arrays, filter_values = doc_columns.to_arrays()
+    for name, array in filter_arrays.items():
+        np.save(tmp_dir / f"filter.{name}.npy", np.ascontiguousarray(array))
+    with open(tmp_dir / "documents.json", "w", encoding="utf-8") as f:
+        json.dump({"store": layout, "filters": filter_values}, f)
+
+    manifest = {
+        "version": ARTIFACT_VERSION,
+        "fingerprint": fingerprint,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "n_documents": tfidf_matrix.shape[0],
+        "n_terms": tfidf_matrix.shape[1],
+        "ranking": ranking or {"mode": "tfidf"},
+        "vectorizer": {
+            "stop_words": sorted(vectorizer.get_stop_words() or []),
+            "ngram_range": list(vectorizer.ngram_range),
+            "lowercase": vectorizer.lowercase,
+            "token_pattern": vectorizer.token_pattern,
+            "norm": vectorizer.norm,
+            "sublinear_tf": vectorizer.sublinear_tf,
+        },
+    }
+    # Manifest goes last so a crash mid-write never leaves a loadable artifact
+    with open(tmp_dir / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(index_dir, ignore_errors=True)
+    os.replace(tmp_dir, index_dir)
+
+
+def read_manifest(index_dir: Path) -> Optional[Dict[str, Any]]:
+    """Read the artifact manifest, or None if there is no usable artifact"""
+    try:
+        with open(Path(index_dir) / "manifest.json", "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def load_index(
+    index_dir: Path,
+    fingerprint: str,
+    ranking: Optional[Dict[str, Any]] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Load the index artifact if it matches the current data, version and
+    ranking settings.
+
+    Returns None when the artifact is missing or stale, so the caller can
+    fall back to rebuilding from data/*.json.
+    """
+    index_dir = Path(index_dir)
+    manifest = read_manifest(index_dir)
+    if manifest is None:
+        return None
+    if manifest.get("version") != ARTIFACT_VERSION or manifest.get("fingerprint") != fingerprint:
+        return None
+    if manifest.get("ranking") != (ranking or {"mode": "tfidf"}):
+        return None
+
+    arrays = {name: np.load(index_dir / f"{name}.npy", mmap_mode="r") for name in ARRAY_FILES}
+
+    with open(index_dir / "vocabulary.json", "r", encoding="utf-8") as f:
+        vocabulary = json.load(f)
+    with open(index_dir / "documents.json", "r", encoding="utf-8") as f:
+        layout = json.load(f)
+    store = DocumentStore.from_arrays(
+        {name: np.load(index_dir / f"doc.{name}.npy", mmap_mode="r")
+         for name in DocumentStore.array_names(layout["store"])},
+        layout["store"]
+    )
+    doc_columns = DocumentColumns.from_arrays(
+        {name: np.load(index_dir / f"filter.{name}.npy", mmap_mode="r") for name in DocumentColumns.ARRAYS},
+        layout["filters"]
+    )
+
+    # QueryVectorizer reproduces the fitted TfidfVectorizer without importing sklearn
+    settings = manifest["vectorizer"]
+    vectorizer = QueryVectorizer(
+        vocabulary={term: i for i, term in enumerate(vocabulary)},
+        idf=np.asarray(arrays["idf"]),
+        stop_words=settings["stop_words"],
+        ngram_range=tuple(settings["ngram_range"]),
+        lowercase=settings["lowercase"],
+        token_pattern=settings["token_pattern"],
+        norm=settings["norm"],
+        sublinear_tf=settings["sublinear_tf"]
+    )
+
+    shape = (manifest["n_documents"], manifest["n_terms"])
+    tfidf_matrix = sparse.csr_matrix(
+        (arrays["tfidf_data"], arrays["tfidf_indices"], arrays["tfidf_indptr"]),
+        shape=shape
+    )
+    search_index = InvertedIndex.from_postings(
+        arrays["postings_ptr"], arrays["postings_docs"], arrays["postings_weights"], shape
+    )
+
+    return {
+        "store": store,
+        "doc_columns": doc_columns,
+        "vectorizer": vectorizer,
+        "tfidf_matrix": tfidf_matrix,
+        "search_index": search_index,
+    }
@@ -0,0 +1,169 @@
+"""
+Streaming Ingestion
+===================
+Reads knowledge base records and fits the TF-IDF index without holding a
+whole export (or its token matrix) in memory at once.
+
+- Records are read one at a time: JSONL line by line, and JSON files by
+  decoding the array under a key (e.g. "meals") element by element from a
+  buffered reader, so a multi-GB export never becomes one Python object.
+- fit_tfidf makes two passes over the documents in chunks: the first
+  counts term and document frequencies to choose the vocabulary and IDF,
+  the second vectorizes each chunk against that vocabulary. Only one chunk
+  of tokens is alive at a time, instead of the corpus-wide index arrays
+  TfidfVectorizer.fit_transform builds.
+
+fit_tfidf reproduces TfidfVectorizer(stop_words, ngram_range, max_features)
+exactly: same vocabulary, same smoothed IDF, same matrix.
+"""
+
+import json
+import re
+from collections import Counter
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from text_vectorizer import QueryVectorizer
+
+CHUNK_SIZE = 10000
+READ_SIZE = 1 << 20
+
+
+def batched(items: Iterable[Any], size: int = CHUNK_SIZE) -> Iterator[List[Any]]:
+    """Consecutive lists of up to size items"""
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    """One record per non-empty line"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_number}: {e}") from e
+
+
+def iter_json_array(path: Path, key: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Elements of the first array under key (or of a top-level array),
+    decoded one at a time from a buffered read of the file
+    """
+    decoder = json.JSONDecoder()
+    start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key)) if key else re.compile(r"\[")
+
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = f.read(READ_SIZE)
+
+        def more() -> bool:
+            nonlocal buffer
+            data = f.read(READ_SIZE)
+            buffer += data
+            return bool(data)
+
+        match = start.search(buffer)
+        while match is None:
+            if not more():
+                return  # no such array: nothing to ingest
+            match = start.search(buffer)
+        pos = match.end()
+
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buffer):
+                if not more():
+                    raise ValueError(f"{path}: unterminated array")
+                continue
+            if buffer[pos] == "]":
+                return
+
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if not more():
+                    raise
+                continue
+            if end == len(buffer) and more():
+                continue  # a number may continue in the next read
+            yield record
+
+            # Drop what has been decoded so the buffer stays about READ_SIZE
+            if end > READ_SIZE:
+                buffer, pos = buffer[end:], 0
+            else:
+                pos = end
+
+
+def iter_source(data_path: Path, stem: str, key: str) -> Iterator[Dict[str, Any]]:
+    """Records from <stem>.jsonl and the key array of <stem>.json, whichever exist"""
+    jsonl_path = data_path / f"{stem}.jsonl"
+    if jsonl_path.exists():
+        yield from iter_jsonl(jsonl_path)
+    json_path = data_path / f"{stem}.json"
+    if json_path.exists():
+        yield from iter_json_array(json_path, key)
+
+
+def fit_tfidf(
+    texts: Callable[[], Iterable[str]],
+    stop_words: Iterable[str],
+    ngram_range: Tuple[int, int] = (1, 2),
+    max_features: Optional[int] = None,
+    chunk_size: int = CHUNK_SIZE
+) -> Tuple[QueryVectorizer, sparse.csr_matrix]:
+    """
+    Fit TF-IDF in two chunked passes; texts() must return a fresh iterable each call.
+
+    Returns the fitted vectorizer and the (documents x terms) TF-IDF matrix.
+    """
+    analyzer = QueryVectorizer({}, np.empty(0), stop_words=stop_words, ngram_range=ngram_range).build_analyzer()
+
+    # Pass 1: corpus term frequency (ranks features) and document frequency (IDF)
+    term_freq: Counter = Counter()
+    doc_freq: Counter = Counter()
+    n_docs = 0
+    for chunk in batched(texts(), chunk_size):
+        for text in chunk:
+            tokens = analyzer(text)
+            term_freq.update(tokens)
+            doc_freq.update(set(tokens))
+        n_docs += len(chunk)
+
+    # Same selection as CountVectorizer: the max_features most frequent
+    # terms, indexed alphabetically. Its argsort isn't stable, so ties are
+    # only resolved identically with the same call on the same int64 array.
+    terms = sorted(term_freq)
+    if max_features is not None and len(terms) > max_features:
+        totals = np.array([term_freq[t] for t in terms], dtype=np.int64)
+        keep = np.sort((-totals).argsort()[:max_features])
+        terms = [terms[i] for i in keep]
+    del term_freq
+
+    df = np.array([doc_freq[t] for t in terms], dtype=np.float64)
+    del doc_freq
+    idf = np.log((1 + n_docs) / (1 + df)) + 1  # smooth_idf
+
+    vectorizer = QueryVectorizer(
+        vocabulary={term: i for i, term in enumerate(terms)},
+        idf=idf,
+        stop_words=stop_words,
+        ngram_range=ngram_range
+    )
+
+    # Pass 2: vectorize chunk by chunk
+    blocks = [vectorizer.transform(chunk).astype(np.float32) for chunk in batched(texts(), chunk_size)]
+    matrix = sparse.vstack(blocks, format="csr") if blocks else sparse.csr_matrix((0, len(terms)), dtype=np.float32)
+    return vectorizer, matrix
@@ -0,0 +1,369 @@
+"""
+LLM Backends
+============
+Pluggable text-generation backends used by RAGSystem.
+
+- GeminiBackend: Google Gemini via the google-genai package
+- MockBackend:   fixed setup message (no API key configured)
+- FakeBackend:   deterministic local stand-in for load tests and benchmarks,
+                 with configurable latency, streaming rate, error rate and
+                 realistic JSON plan payloads
+
+Select with LLM_BACKEND=gemini|mock|fake (default: gemini, falling back to
+mock when no API key or package is available).
+"""
+
+import asyncio
+import hashlib
+import importlib.util
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import AsyncIterator, List, Optional, Tuple
+
+# google-genai takes a few hundred ms to import, so only check that it is
+# installed here; GeminiBackend imports it on first use
+try:
+    GENAI_AVAILABLE = importlib.util.find_spec("google.genai") is not None
+except ImportError:
+    GENAI_AVAILABLE = False
+
+
+class LLMBackend:
+    """
+    Interface for text-generation backends.
+
+    Implementations raise on failure; RAGSystem turns errors into a
+    user-facing apology and counts them.
+    """
+
+    name = "base"
+    model_name = "none"
+    # Whether responses may be stored in the LLM response cache
+    cacheable = True
+
+    def generate(self, prompt: str) -> str:
+        raise NotImplementedError
+
+    async def agenerate(self, prompt: str) -> str:
+        raise NotImplementedError
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        """Yield the response in chunks; defaults to a single chunk"""
+        yield await self.agenerate(prompt)
+
+    def warmup(self):
+        """Do slow one-time setup (imports, clients) before the first request"""
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini through google-genai (sync and async clients)"""
+
+    name = "gemini"
+
+    def __init__(self, api_key: str, model_name: str):
+        self.api_key = api_key
+        self.model_name = model_name
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """genai client, created (and google.genai imported) on first use"""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from google import genai
+                    self._client = genai.Client(api_key=self.api_key)
+        return self._client
+
+    def warmup(self):
+        self.client  # imports google.genai and builds the client
+
+    def generate(self, prompt: str) -> str:
+        response = self.client.models.generate_content(
+            model=self.model_name,
+            contents=prompt
+        )
+        return response.text
+
+    async def agenerate(self, prompt: str) -> str:
+        response = await self.client.aio.models.generate_content(
+            model=self.model_name,
+            contents=prompt
+        )
+        return response.text
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        stream = await self.client.aio.models.generate_content_stream(
+            model=self.model_name,
+            contents=prompt
+        )
+        async for chunk in stream:
+            if chunk.text:
+                yield chunk.text
+
+
+class MockBackend(LLMBackend):
+    """Mock response when Gemini is not configured"""
+
+    name = "mock"
+    model_name = "mock"
+    cacheable = False
+
+    def generate(self, prompt: str) -> str:
+        return """I'm SmartCoach AI! To enable full AI responses:
+1. Get a free Gemini API key from https://aistudio.google.com/app/apikey
+2. Add it to your .env file as GEMINI_API_KEY=your-key
+
+For now, here's a tip: Stay consistent with your workouts and focus on proper nutrition!"""
+
+    async def agenerate(self, prompt: str) -> str:
+        return self.generate(prompt)
+
+
+class FakeLLMError(RuntimeError):
+    """Simulated upstream failure raised by FakeBackend"""
+
+
+class FakeBackend(LLMBackend):
+    """
+    Deterministic local stand-in for Gemini.
+
+    Latency model: time-to-first-token is log-normal around
+    `latency_ms` (spread `latency_sigma`), then tokens arrive at
+    `tokens_per_second`. Non-streaming calls wait for the whole response.
+    A seeded RNG makes both the response text (per prompt) and the
+    sequence of latencies/errors (per run) reproducible.
+    """
+
+    name = "fake"
+    model_name = "fake-llm"
+
+    def __init__(
+        self,
+        latency_ms: float = 400.0,
+        latency_sigma: float = 0.5,
+        tokens_per_second: float = 150.0,
+        error_rate: float = 0.0,
+        seed: int = 0
+    ):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.seed = seed
+        self._calls = 0
+        self._lock = threading.Lock()
+
+    # ---------- timing ----------
+
+    def _next_call(self) -> Tuple[float, bool]:
+        """Sample (time_to_first_token_seconds, should_fail) for the next call"""
+        with self._lock:
+            self._calls += 1
+            rng = random.Random(f"{self.seed}:{self._calls}")
+        ttft = self.latency_ms / 1000.0 * rng.lognormvariate(0.0, self.latency_sigma)
+        return ttft, rng.random() < self.error_rate
+
+    def _token_delay(self) -> float:
+        return 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    @staticmethod
+    def _tokens(text: str) -> List[str]:
+        """Split text into word-sized chunks that concatenate back to the original"""
+        return re.findall(r"\s*\S+|\s+", text)
+
+    def generate(self, prompt: str) -> str:
+        ttft, fail = self._next_call()
+        text = self.respond(prompt)
+        time.sleep(ttft + len(self._tokens(text)) * self._token_delay())
+        if fail:
+            raise FakeLLMError("Simulated LLM failure")
+        return text
+
+    async def agenerate(self, prompt: str) -> str:
+        ttft, fail = self._next_call()
+        text = self.respond(prompt)
+        await asyncio.sleep(ttft + len(self._tokens(text)) * self._token_delay())
+        if fail:
+            raise FakeLLMError("Simulated LLM failure")
+        return text
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        ttft, fail = self._next_call()
+        await asyncio.sleep(ttft)
+        if fail:
+            raise FakeLLMError("Simulated LLM failure")
+
+        delay = self._token_delay()
+        for token in self._tokens(self.respond(prompt)):
+            yield token
+            if delay:
+                await asyncio.sleep(delay)
+
+    # ---------- payloads ----------
+
+    def respond(self, prompt: str) -> str:
+        """Deterministic response text shaped like what the prompt asks for"""
+        digest = hashlib.sha256(f"{self.seed}:{prompt}".encode("utf-8")).hexdigest()
+        rng = random.Random(digest)
+
+        if '"weekly_schedule"' in prompt:
+            return json.dumps(self._fitness_plan(prompt, rng), indent=2)
+        if '"workouts"' in prompt:
+            return json.dumps(self._workout_plan(prompt, rng), indent=2)
+        if '"daily_plan"' in prompt:
+            return json.dumps(self._meal_plan(prompt, rng), indent=2)
+        return self._chat_answer(prompt, rng)
+
+    @staticmethod
+    def _field(prompt: str, label: str, default: str = "") -> str:
+        match = re.search(rf"^- {re.escape(label)}: (.+)$", prompt, re.MULTILINE)
+        return match.group(1).strip() if match else default
+
+    @staticmethod
+    def _int_field(prompt: str, label: str, default: int) -> int:
+        match = re.search(rf"{re.escape(label)}: (\d+)", prompt)
+        return int(match.group(1)) if match else default
+
+    @staticmethod
+    def _names(prompt: str, label: str) -> List[str]:
+        return re.findall(rf"^{label}: (.+)$", prompt, re.MULTILINE) or [f"Generic {label.lower()}"]
+
+    def _exercises(self, prompt: str, rng: random.Random, count: int) -> List[dict]:
+        names = self._names(prompt, "Exercise")
+        return [
+            {
+                "name": name,
+                "sets": rng.choice([3, 4]),
+                "reps": rng.choice(["8-10", "10-12", "12-15"]),
+                "rest_seconds": rng.choice([45, 60, 90])
+            }
+            for name in rng.sample(names, min(count, len(names)))
+        ]
+
+    def _workout_plan(self, prompt: str, rng: random.Random) -> dict:
+        days = self._int_field(prompt, "Days per Week", 3)
+        duration = self._int_field(prompt, "Duration", 45)
+        goal = self._field(prompt, "Goal", "general fitness")
+        return {
+            "name": f"{goal.replace('_', ' ').title()} Program",
+            "days_per_week": days,
+            "workouts": [
+                {
+                    "day": day,
+                    "name": rng.choice(["Upper Body", "Lower Body", "Full Body", "Push", "Pull", "Core"]),
+                    "duration_minutes": duration,
+                    "exercises": self._exercises(prompt, rng, rng.randint(4, 6)),
+                    "warmup": "5 min cardio",
+                    "cooldown": "5 min stretching"
+                }
+                for day in range(1, days + 1)
+            ]
+        }
+
+    def _meal_plan(self, prompt: str, rng: random.Random) -> dict:
+        meals = self._int_field(prompt, "Meals per Day", 3)
+        calories = self._int_field(prompt, "Target Calories", 2000)
+        goal = self._field(prompt, "Goal", "stay_fit")
+        names = self._names(prompt, "Meal")
+        slots = ["Breakfast", "Lunch", "Dinner", "Snack", "Snack", "Snack"]
+        times = ["7:00 AM", "12:30 PM", "7:00 PM", "10:00 AM", "4:00 PM", "9:00 PM"]
+        return {
+            "name": f"{goal.replace('_', ' ').title()} Meal Plan",
+            "goal": goal,
+            "daily_calories": calories,
+            "meals_per_day": meals,
+            "daily_plan": [
+                {
+                    "meal": slots[i % len(slots)],
+                    "time": times[i % len(times)],
+                    "name": rng.choice(names),
+                    "calories": calories // max(meals, 1),
+                    "protein_g": rng.randint(15, 45),
+                    "ingredients": rng.sample(["oats", "eggs", "chicken breast", "rice", "broccoli",
+                                               "greek yogurt", "salmon", "spinach", "quinoa"], 3)
+                }
+                for i in range(meals)
+            ],
+            "tips": ["Drink water with every meal", "Prioritise protein at each meal"]
+        }
+
+    def _fitness_plan(self, prompt: str, rng: random.Random) -> dict:
+        goal = self._field(prompt, "Goal", "stay_fit")
+        weeks = self._int_field(prompt, "Duration", 4)
+        meals = self._names(prompt, "Meal")
+        return {
+            "plan_name": f"{goal.replace('_', ' ').title()} Plan",
+            "goal": goal,
+            "duration_weeks": weeks,
+            "weekly_schedule": [
+                {
+                    "day": day,
+                    "workout": {
+                        "name": f"{day} Session",
+                        "exercises": [
+                            {k: v for k, v in exercise.items() if k != "rest_seconds"}
+                            for exercise in self._exercises(prompt, rng, 4)
+                        ],
+                        "duration_minutes": 45
+                    },
+                    "nutrition": {
+                        "calories_target": rng.choice([1800, 2000, 2200, 2500]),
+                        "meals": [rng.choice(meals) for _ in range(3)]
+                    }
+                }
+                for day in ["Monday", "Wednesday", "Friday"]
+            ],
+            "tips": ["Progress gradually", "Sleep 7-9 hours"]
+        }
+
+    def _chat_answer(self, prompt: str, rng: random.Random) -> str:
+        question = re.search(r"^USER QUESTION: (.+)$", prompt, re.MULTILINE)
+        topic = question.group(1).strip() if question else "your training"
+        names = re.findall(r"^(?:Exercise|Meal|Topic): (.+)$", prompt, re.MULTILINE)
+        picks = rng.sample(names, min(len(names), 3)) if names else ["consistent training"]
+        lines = [f"Great question about {topic}", "", "Here's what I'd suggest:"]
+        lines += [f"- **{name}**: a solid choice for your goals." for name in picks]
+        lines += ["", "Stay consistent, focus on form, and progress gradually!"]
+        return "\n".join(lines)
+
+
+def create_backend(model_name: Optional[str] = None) -> LLMBackend:
+    """Create the LLM backend selected by LLM_BACKEND"""
+    backend = os.getenv("LLM_BACKEND", "gemini").lower()
+    model_name = model_name or os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+
+    if backend == "fake":
+        print("[OK] Using fake LLM backend")
+        return FakeBackend(
+            latency_ms=float(os.getenv("FAKE_LLM_LATENCY_MS", "400")),
+            latency_sigma=float(os.getenv("FAKE_LLM_LATENCY_SIGMA", "0.5")),
+            tokens_per_second=float(os.getenv("FAKE_LLM_TOKENS_PER_SEC", "150")),
+            error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+            seed=int(os.getenv("FAKE_LLM_SEED", "0"))
+        )
+
+    if backend == "mock":
+        return MockBackend()
+
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        print("[WARNING] GEMINI_API_KEY not set. Using mock responses.")
+        return MockBackend()
+
+    if not GENAI_AVAILABLE:
+        print("[WARNING] google-genai package not available. Using mock responses.")
+        return MockBackend()
+
+    try:
+        gemini = GeminiBackend(api_key, model_name)
+        print("[OK] Gemini API configured")
+        return gemini
+    except Exception as e:
+        print(f"[ERROR] Gemini setup error: {e}")
+        return MockBackend()
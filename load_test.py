@@ -0,0 +1,88 @@
+"""Load test: throughput vs concurrency against a running server
+
+Run the server first (uvicorn main:app --port 8000), then:
+    python load_test.py [endpoint] [requests_per_level]
+
+Throughput should scale with concurrency while the LLM calls are in flight,
+since handlers no longer block the event loop.
+"""
+import asyncio
+import sys
+import time
+
+import httpx
+
+BASE_URL = "http://localhost:8000"
+CONCURRENCY_LEVELS = [1, 10, 50, 100, 200]
+
+PAYLOADS = {
+    "/rag/query": {
+        "query": "What is a good chest workout for beginners?",
+        "user_id": "load_test"
+    },
+    "/rag/workout-plan": {
+        "user_id": "load_test",
+        "fitness_level": "beginner",
+        "goal": "build_muscle",
+        "days_per_week": 3
+    },
+    "/rag/meal-plan": {
+        "user_id": "load_test",
+        "goal": "build_muscle",
+        "calories_target": 2500,
+        "meals_per_day": 4
+    },
+}
+
+
+async def run_level(client, endpoint, concurrency, total):
+    """Send `total` requests with at most `concurrency` in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.post(endpoint, json=PAYLOADS[endpoint])
+                if response.status_code != 200:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "throughput": total / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "errors": errors,
+    }
+
+
+async def main(endpoint, total):
+    limits = httpx.Limits(max_connections=max(CONCURRENCY_LEVELS))
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=120, limits=limits) as client:
+        for concurrency in CONCURRENCY_LEVELS:
+            result = await run_level(client, endpoint, concurrency, max(total, concurrency))
+            print(f"  c={result['concurrency']:>4}  "
+                  f"{result['throughput']:8.1f} req/s  "
+                  f"p50={result['p50_ms']:8.1f}ms  "
+                  f"p95={result['p95_ms']:8.1f}ms  "
+                  f"errors={result['errors']}")
+
+
+if __name__ == "__main__":
+    endpoint = sys.argv[1] if len(sys.argv) > 1 else "/rag/query"
+    total = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    print(f"SmartCoach AI Service - Load Test ({endpoint})")
+    print("=" * 50)
+    asyncio.run(main(endpoint, total))
@@ -7,22 +7,57 @@ Run with: uvicorn main:app --reload --port 8000
 Docs at: http://localhost:8000/docs
 """
 
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 from rag import RAGSystem
+from custom_documents import validate_document
+from data_watcher import create_data_watcher, create_document_watcher
+import metrics
 from dotenv import load_dotenv
+import asyncio
+import json
 import os
+import threading
+import uuid
 
 # Load environment variables
 load_dotenv()
 
+# "background": bind the port at once and load the index in a background
+# thread, answering RAG routes with 503 until it is ready. "eager": load it
+# at import; gunicorn.conf.py picks this with preload_app so forked workers
+# share the loaded index.
+WARMUP_MODE = os.getenv("RAG_WARMUP", "background").lower()
+RETRY_AFTER_SECONDS = int(os.getenv("RAG_RETRY_AFTER_SECONDS", "5"))
+# Required in X-Admin-Token for /admin/* endpoints; unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the RAG warmup without holding up server startup, and the data watchers"""
+    if not rag.is_initialized and rag.init_error is None:
+        threading.Thread(target=rag.warmup, name="rag-warmup", daemon=True).start()
+    # Started per worker: every process holds its own index snapshot
+    watchers = [create_data_watcher(rag.reload), create_document_watcher(rag.sync_custom_documents)]
+    watchers = [watcher for watcher in watchers if watcher is not None]
+    for watcher in watchers:
+        watcher.start()
+    yield
+    for watcher in watchers:
+        watcher.stop()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="SmartCoach AI Service",
     description="RAG-powered fitness and nutrition AI assistant",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS - Allow NestJS backend to call this service
@@ -34,8 +69,71 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize RAG System
-rag = RAGSystem()
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Initialize RAG System (the index is loaded by warmup())
+rag = RAGSystem(lazy=True)
+if WARMUP_MODE == "eager":
+    rag.warmup()
+
+
+def _cache_stat(name: str):
+    """Read one LLM cache statistic at scrape time"""
+    return lambda: rag.response_cache.stats()[name] if rag.response_cache else None
+
+
+metrics.CallbackMetric("llm_cache_hits_total", "LLM response cache hits", "counter", _cache_stat("hits"))
+metrics.CallbackMetric("llm_cache_misses_total", "LLM response cache misses", "counter", _cache_stat("misses"))
+metrics.CallbackMetric("llm_cache_hit_ratio", "LLM response cache hit ratio", "gauge", _cache_stat("hit_rate"))
+metrics.CallbackMetric(
+    "semantic_cache_hits_total", "Chat queries answered from the semantic cache", "counter",
+    lambda: rag.semantic_cache.hits if rag.semantic_cache else None
+)
+metrics.CallbackMetric(
+    "semantic_cache_misses_total", "Chat queries not found in the semantic cache", "counter",
+    lambda: rag.semantic_cache.misses if rag.semantic_cache else None
+)
+metrics.CallbackMetric(
+    "semantic_cache_entries", "Answers currently held in the semantic cache", "gauge",
+    lambda: rag.semantic_cache.stats()["entries"] if rag.semantic_cache else None
+)
+metrics.CallbackMetric(
+    "rag_query_cache_hits_total", "Searches answered from the current index's query cache", "counter",
+    lambda: rag.snapshot.query_cache.results.hits if rag.snapshot and rag.snapshot.query_cache else None
+)
+metrics.CallbackMetric(
+    "rag_query_cache_misses_total", "Searches not found in the current index's query cache", "counter",
+    lambda: rag.snapshot.query_cache.results.misses if rag.snapshot and rag.snapshot.query_cache else None
+)
+metrics.CallbackMetric(
+    "rag_ready", "1 once the search index is loaded and RAG routes are served", "gauge",
+    lambda: int(rag.is_initialized)
+)
+metrics.CallbackMetric(
+    "llm_coalesced_total", "LLM calls avoided by joining an identical in-flight call", "counter",
+    lambda: rag.llm_flights.coalesced if rag.llm_flights else None
+)
+metrics.CallbackMetric(
+    "llm_calls_in_flight", "Distinct LLM calls currently in flight", "gauge",
+    lambda: rag.llm_flights.in_flight if rag.llm_flights else None
+)
+
+MAX_BATCH_QUERIES = int(os.getenv("RAG_BATCH_MAX_QUERIES", "100"))
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Check X-Admin-Token; admin endpoints are disabled when ADMIN_TOKEN is unset"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (set ADMIN_TOKEN)")
+    if x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+def require_ready():
+    """Answer 503 with Retry-After until the RAG index is loaded"""
+    if not rag.is_initialized:
+        detail = f"RAG system failed to start: {rag.init_error}" if rag.init_error else "RAG system is warming up"
+        raise HTTPException(status_code=503, detail=detail, headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
 
 
 # ==========================================
@@ -53,6 +151,15 @@ class QueryResponse(BaseModel):
     response: str
     sources: Optional[List[str]] = None
 
+class BatchQueryRequest(BaseModel):
+    """Request for answering many chat questions at once"""
+    queries: List[QueryRequest]
+    max_concurrency: Optional[int] = None  # capped at RAG_BATCH_CONCURRENCY
+
+class BatchQueryResponse(BaseModel):
+    """Responses for a batch query, in the same order as the input"""
+    results: List[QueryResponse]
+
 class PlanRequest(BaseModel):
     """Request for generating plans"""
     user_id: str
@@ -69,6 +176,7 @@ class WorkoutPlanRequest(BaseModel):
     available_equipment: Optional[List[str]] = None
     duration_minutes: Optional[int] = 45
     days_per_week: Optional[int] = 3
+    include_notes: Optional[bool] = False  # ask the LLM for coaching notes on the plan
 
 class MealPlanRequest(BaseModel):
     """Request for meal plan generation"""
@@ -77,6 +185,13 @@ class MealPlanRequest(BaseModel):
     dietary_restrictions: Optional[List[str]] = None  # "vegetarian", "vegan", "gluten_free"
     calories_target: Optional[int] = None
     meals_per_day: Optional[int] = 3
+    include_notes: Optional[bool] = False  # ask the LLM for notes on the plan
+
+class DocumentRequest(BaseModel):
+    """An exercise, meal or tip to add to the knowledge base"""
+    type: str  # "exercise", "meal", "tip"
+    data: Dict[str, Any]  # same fields as the entries in data/workouts.json, nutrition.json, tips.json
+    id: Optional[str] = None  # generated when omitted (POST only)
 
 
 # ==========================================
@@ -92,10 +207,97 @@ async def root():
 @app.get("/health")
 async def health():
     """Health check for monitoring"""
-    return {"status": "healthy", "rag_initialized": rag.is_initialized}
+    return {
+        "status": "healthy",
+        "rag_initialized": rag.is_initialized,
+        "llm_backend": rag.llm.name,
+        "llm_cache": rag.response_cache.stats() if rag.response_cache else None,
+        "semantic_cache": rag.semantic_cache.stats() if rag.semantic_cache else None,
+        "index": rag.snapshot.stats() if rag.snapshot else None,
+        "last_reload": rag.last_reload
+    }
+
+
+@app.get("/livez")
+async def livez():
+    """Liveness: the process serves requests; fails only if warmup failed for good"""
+    if rag.init_error:
+        return JSONResponse({"status": "failed", "error": rag.init_error}, status_code=503)
+    return {"status": "alive"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: the index is loaded and RAG routes can be served"""
+    if rag.is_initialized:
+        return {"status": "ready"}
+    status = "failed" if rag.init_error else "starting"
+    return JSONResponse(
+        {"status": status, "error": rag.init_error},
+        status_code=503,
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus metrics: request counts/latency per route, RAG stage latency, LLM errors, cache hits"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/admin/reload", dependencies=[Depends(require_admin)])
+async def reload_index(force: bool = False):
+    """
+    Rebuild the index from data/*.json in the background and swap it in
+
+    Requests keep being served from the old index until the new one is
+    complete. Only reloads the worker that handles this request; use
+    RAG_WATCH_DATA=true to keep every worker in sync.
+    """
+    try:
+        return await asyncio.get_running_loop().run_in_executor(None, rag.reload, force)
+    except Exception as e:
+        print(f"[ERROR] Reload failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Reload failed, still serving the previous index: {e}")
+
+
+async def _upsert_document(doc_id: str, request: DocumentRequest) -> Dict[str, Any]:
+    problem = validate_document(request.type, request.data)
+    if problem:
+        raise HTTPException(status_code=422, detail=problem)
+    replaced = await asyncio.get_running_loop().run_in_executor(
+        None, rag.upsert_document, doc_id, request.type, request.data
+    )
+    return {"id": doc_id, "created": not replaced, "index": rag.snapshot.stats()}
 
 
-@app.post("/rag/query", response_model=QueryResponse)
+@app.post("/admin/documents", status_code=201, dependencies=[Depends(require_admin), Depends(require_ready)])
+async def add_document(request: DocumentRequest):
+    """
+    Add an exercise, meal or tip; searchable as soon as this returns
+
+    New documents go into a small delta segment next to the main index
+    and are merged into it in the background (see RAG_DELTA_MERGE_DOCS).
+    """
+    return await _upsert_document(request.id or uuid.uuid4().hex, request)
+
+
+@app.put("/admin/documents/{doc_id}", dependencies=[Depends(require_admin), Depends(require_ready)])
+async def put_document(doc_id: str, request: DocumentRequest):
+    """Create or replace the document with this id"""
+    return await _upsert_document(doc_id, request)
+
+
+@app.delete("/admin/documents/{doc_id}", dependencies=[Depends(require_admin), Depends(require_ready)])
+async def delete_document(doc_id: str):
+    """Remove a document added through the API"""
+    deleted = await asyncio.get_running_loop().run_in_executor(None, rag.delete_document, doc_id)
+    if not deleted:
+        raise HTTPException(status_code=404, detail=f"No document with id '{doc_id}'")
+    return {"id": doc_id, "deleted": True, "index": rag.snapshot.stats()}
+
+
+@app.post("/rag/query", response_model=QueryResponse, dependencies=[Depends(require_ready)])
 async def chat_query(request: QueryRequest):
     """
     General chat endpoint - Ask any fitness/nutrition question
@@ -107,13 +309,81 @@ async def chat_query(request: QueryRequest):
     }
     """
     try:
-        response, sources = rag.query(request.query, request.context)
+        response, sources = await rag.aquery(request.query, request.context)
         return QueryResponse(response=response, sources=sources)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/rag/plan")
+@app.post("/rag/query/batch", response_model=BatchQueryResponse, dependencies=[Depends(require_ready)])
+async def chat_query_batch(request: BatchQueryRequest):
+    """
+    Batch chat endpoint - answer many questions in one call
+
+    Retrieval for all queries runs as one vectorized pass; LLM calls run
+    concurrently up to max_concurrency. Results keep the input order.
+
+    Example:
+    {
+        "queries": [
+            {"query": "Best chest exercises?"},
+            {"query": "High protein breakfast ideas?"}
+        ],
+        "max_concurrency": 4
+    }
+    """
+    if len(request.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BATCH_QUERIES} queries per batch"
+        )
+
+    try:
+        answers = await rag.aquery_batch(
+            [item.query for item in request.queries],
+            max_concurrency=request.max_concurrency
+        )
+        return BatchQueryResponse(results=[
+            QueryResponse(response=response, sources=sources)
+            for response, sources in answers
+        ])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _sse_event(event: str, data: Any) -> str:
+    """Format one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/rag/query/stream", dependencies=[Depends(require_ready)])
+async def chat_query_stream(request: QueryRequest):
+    """
+    Streaming chat endpoint - same input as /rag/query, answered as server-sent events
+
+    Events, in order:
+    - sources: list of retrieved documents (sent as soon as search finishes)
+    - token:   {"text": "..."} for each chunk of the response
+    - done:    {} when the response is complete (or error: {"detail": "..."})
+    """
+    async def event_stream():
+        try:
+            async for event, data in rag.aquery_stream(request.query, request.context):
+                if event == "token":
+                    data = {"text": data}
+                yield _sse_event(event, data)
+            yield _sse_event("done", {})
+        except Exception as e:
+            yield _sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/rag/plan", dependencies=[Depends(require_ready)])
 async def generate_fitness_plan(request: PlanRequest):
     """
     Generate a complete fitness plan (workout + nutrition)
@@ -127,7 +397,7 @@ async def generate_fitness_plan(request: PlanRequest):
     }
     """
     try:
-        plan = rag.generate_fitness_plan(
+        plan = await rag.agenerate_fitness_plan(
             goal=request.goal,
             fitness_level=request.fitness_level,
             preferences=request.preferences,
@@ -138,7 +408,7 @@ async def generate_fitness_plan(request: PlanRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/rag/workout-plan")
+@app.post("/rag/workout-plan", dependencies=[Depends(require_ready)])
 async def generate_workout_plan(request: WorkoutPlanRequest):
     """
     Generate a workout plan
@@ -153,19 +423,20 @@ async def generate_workout_plan(request: WorkoutPlanRequest):
     }
     """
     try:
-        plan = rag.generate_workout_plan(
+        plan = await rag.agenerate_workout_plan(
             fitness_level=request.fitness_level,
             goal=request.goal,
             equipment=request.available_equipment,
             duration=request.duration_minutes,
-            days_per_week=request.days_per_week
+            days_per_week=request.days_per_week,
+            include_notes=bool(request.include_notes)
         )
         return {"plan": plan, "user_id": request.user_id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/rag/meal-plan")
+@app.post("/rag/meal-plan", dependencies=[Depends(require_ready)])
 async def generate_meal_plan(request: MealPlanRequest):
     """
     Generate a meal/nutrition plan
@@ -179,11 +450,12 @@ async def generate_meal_plan(request: MealPlanRequest):
     }
     """
     try:
-        plan = rag.generate_meal_plan(
+        plan = await rag.agenerate_meal_plan(
             goal=request.goal,
             restrictions=request.dietary_restrictions,
             calories=request.calories_target,
-            meals_per_day=request.meals_per_day
+            meals_per_day=request.meals_per_day,
+            include_notes=bool(request.include_notes)
         )
         return {"plan": plan, "user_id": request.user_id}
     except Exception as e:
@@ -0,0 +1,234 @@
+"""
+Meal Optimizer
+==============
+Picks a day of meals that hits calorie and macro targets, using the
+nutrition values in data/nutrition.json instead of an LLM's guess.
+
+Each meal slot (breakfast, lunch, dinner, snack) chooses one meal and a
+portion size. The search is a beam search over slots: every beam state
+is expanded with every (meal, portion) option as one NumPy array, partial
+totals are scored against the pro-rated targets, and the best states are
+kept with argpartition. The final plan's numbers are computed from the
+data, so the totals always add up.
+
+Each slot only considers the SLOT_CANDIDATES meals closest to its share
+of the targets, so the per-step arrays stay small for any catalogue
+size. from_columns builds the optimizer straight from the metadata
+columns; only the chosen meals are loaded in full.
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+# Portion multipliers a meal can be served at
+PORTIONS = np.array([0.5, 0.75, 1.0, 1.25, 1.5, 2.0], dtype=np.float64)
+BEAM_WIDTH = 256
+# Meals a slot considers: the ones closest to the slot's share of the
+# targets at their best portion
+SLOT_CANDIDATES = 64
+
+# meals_per_day -> slots in eating order
+SLOTS = {
+    1: ["lunch"],
+    2: ["breakfast", "dinner"],
+    3: ["breakfast", "lunch", "dinner"],
+    4: ["breakfast", "lunch", "snack", "dinner"],
+    5: ["breakfast", "snack", "lunch", "snack", "dinner"],
+    6: ["breakfast", "snack", "lunch", "snack", "dinner", "snack"],
+}
+SLOT_TIMES = {
+    1: ["12:30 PM"],
+    2: ["8:00 AM", "6:30 PM"],
+    3: ["7:00 AM", "12:30 PM", "7:00 PM"],
+    4: ["7:00 AM", "12:30 PM", "4:00 PM", "7:00 PM"],
+    5: ["7:00 AM", "10:00 AM", "12:30 PM", "4:00 PM", "7:00 PM"],
+    6: ["7:00 AM", "10:00 AM", "12:30 PM", "4:00 PM", "7:00 PM", "9:00 PM"],
+}
+MAIN_MEAL_TYPES = ("breakfast", "lunch", "dinner")
+
+# Goal -> (default daily kcal, share of kcal from protein, carbs, fat)
+GOAL_TARGETS = {
+    "lose_weight": (1800, (0.35, 0.35, 0.30)),
+    "build_muscle": (2600, (0.30, 0.45, 0.25)),
+    "stay_fit": (2100, (0.25, 0.50, 0.25)),
+}
+GOAL_ALIASES = {"maintain": "stay_fit", "maintenance": "stay_fit"}
+KCAL_PER_GRAM = np.array([4.0, 4.0, 9.0])  # protein, carbs, fat
+
+# Relative weight of calorie vs each macro error, and the cost of not
+# serving a whole portion
+CALORIE_WEIGHT = 4.0
+MACRO_WEIGHT = 1.0
+PORTION_PENALTY = 0.01
+# Serving the same meal twice only wins when nothing else fits
+REPEAT_PENALTY = 1.0
+
+
+def daily_targets(goal: str, calories: Optional[int] = None) -> Dict[str, float]:
+    """Calorie and macro (grams) targets for a goal, optionally with a fixed calorie target"""
+    goal = GOAL_ALIASES.get(goal, goal)
+    default_calories, shares = GOAL_TARGETS.get(goal, GOAL_TARGETS["stay_fit"])
+    calories = float(calories or default_calories)
+    protein, carbs, fat = calories * np.array(shares) / KCAL_PER_GRAM
+    return {"calories": calories, "protein_g": protein, "carbs_g": carbs, "fat_g": fat}
+
+
+class MealOptimizer:
+    """Beam search over (meal, portion) per slot; meals are metadata dicts with calories and macros"""
+
+    def __init__(self, meals: List[Dict[str, Any]]):
+        nutrients = np.array(
+            [[m.get("calories") or 0, m.get("protein") or 0, m.get("carbs") or 0, m.get("fat") or 0]
+             for m in meals],
+            dtype=np.float32
+        ).reshape(-1, 4)
+        self._init(nutrients, np.array([m.get("meal_type") or "" for m in meals]), meals.__getitem__)
+
+    @classmethod
+    def from_columns(
+        cls,
+        nutrients: np.ndarray,
+        meal_types: np.ndarray,
+        load: Callable[[int], Dict[str, Any]]
+    ) -> "MealOptimizer":
+        """
+        Optimizer over column arrays: nutrients is (n_meals, 4) calories,
+        protein, carbs and fat per portion (NaN = unknown), meal_types the
+        type of each meal, and load(i) the metadata of meal i (name,
+        ingredients), called only for the meals in the plan.
+        """
+        optimizer = cls.__new__(cls)
+        optimizer._init(np.nan_to_num(nutrients), meal_types, load)
+        return optimizer
+
+    def _init(self, nutrients: np.ndarray, meal_types: np.ndarray, load: Callable[[int], Dict[str, Any]]):
+        # (n_meals, 4): calories, protein, carbs, fat per portion
+        self.nutrients = nutrients
+        self.meal_types = meal_types
+        self.load = load
+
+    def _slot_candidates(self, slot: str, slot_target: np.ndarray, target: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """
+        Meal indices allowed in a slot; main slots widen to any main meal,
+        then to anything. Beyond SLOT_CANDIDATES, the meals closest to
+        slot_target at their best portion.
+        """
+        candidates = np.flatnonzero(self.meal_types == slot)
+        if len(candidates) < 2 and slot in MAIN_MEAL_TYPES:
+            candidates = np.flatnonzero(np.isin(self.meal_types, MAIN_MEAL_TYPES))
+        if len(candidates) < 2:
+            candidates = np.arange(len(self.nutrients))
+        if len(candidates) <= SLOT_CANDIDATES:
+            return candidates
+
+        # The beam search's weighted squared error, expanded per meal as
+        # sum(scale * (portion * n - t) ** 2) = portion² a - 2 portion b + c
+        nutrients = self.nutrients[candidates]
+        scale = (weights / target ** 2).astype(np.float32)
+        a = (nutrients * nutrients) @ scale
+        b = nutrients @ (scale * slot_target.astype(np.float32))
+        closest = np.full(len(candidates), np.inf, dtype=np.float32)
+        for portion in PORTIONS:
+            scores = np.float32(portion ** 2) * a - np.float32(2 * portion) * b
+            np.minimum(closest, scores + np.float32(PORTION_PENALTY * abs(portion - 1.0)), out=closest)
+        best = np.argpartition(closest, SLOT_CANDIDATES - 1)[:SLOT_CANDIDATES]
+        return np.sort(candidates[best])
+
+    def plan(self, goal: str, calories: Optional[int] = None, meals_per_day: int = 3) -> Optional[Dict[str, Any]]:
+        """Best day of meals for the targets, or None if there are no meals to choose from"""
+        if not len(self.nutrients):
+            return None
+
+        meals_per_day = min(max(meals_per_day or 3, 1), 6)
+        slots = SLOTS[meals_per_day]
+        targets = daily_targets(goal, calories)
+        target = np.array([targets["calories"], targets["protein_g"], targets["carbs_g"], targets["fat_g"]])
+        weights = np.array([CALORIE_WEIGHT, MACRO_WEIGHT, MACRO_WEIGHT, MACRO_WEIGHT])
+
+        # Beam state: totals (B, 4), chosen meals (B, slots), portions (B, slots), penalty (B,)
+        totals = np.zeros((1, 4))
+        chosen = np.zeros((1, 0), dtype=np.int64)
+        portions = np.zeros((1, 0))
+        penalty = np.zeros(1)
+
+        # Every slot gets the same share of the targets, so repeated slots share candidates
+        slot_candidates = {
+            slot: self._slot_candidates(slot, target / len(slots), target, weights) for slot in set(slots)
+        }
+        for step, slot in enumerate(slots, 1):
+            candidates = slot_candidates[slot]
+            option_meals = np.repeat(candidates, len(PORTIONS))
+            option_portions = np.tile(PORTIONS, len(candidates))
+            option_values = self.nutrients[option_meals].astype(np.float64) * option_portions[:, None]
+
+            # Every beam state x every option at once: (B, O)
+            new_penalty = penalty[:, None] + PORTION_PENALTY * np.abs(option_portions - 1.0)[None, :]
+            repeated = (chosen[:, :, None] == option_meals[None, None, :]).any(axis=1)
+            new_penalty = new_penalty + REPEAT_PENALTY * repeated
+
+            # Score against the targets pro-rated to the slots filled so far,
+            # one nutrient at a time so no (B, O, 4) array is materialised
+            partial_target = target * step / len(slots)
+            scores = None
+            for j in range(len(target)):
+                error = totals[:, j, None] + option_values[None, :, j]
+                error -= partial_target[j]
+                error /= target[j]
+                error **= 2
+                error *= weights[j]
+                scores = error if scores is None else np.add(scores, error, out=scores)
+            scores += new_penalty
+
+            flat = scores.ravel()
+            keep = min(BEAM_WIDTH, len(flat))
+            best = np.argpartition(flat, keep - 1)[:keep] if keep < len(flat) else np.arange(len(flat))
+            best = best[np.argsort(flat[best], kind="stable")]
+            state, option = np.divmod(best, len(option_meals))
+
+            totals = totals[state] + option_values[option]
+            chosen = np.column_stack([chosen[state], option_meals[option]])
+            portions = np.column_stack([portions[state], option_portions[option]])
+            penalty = new_penalty[state, option]
+
+        return self._format_plan(goal, meals_per_day, slots, chosen[0], portions[0], targets)
+
+    def _format_plan(
+        self,
+        goal: str,
+        meals_per_day: int,
+        slots: List[str],
+        chosen: np.ndarray,
+        portions: np.ndarray,
+        targets: Dict[str, float]
+    ) -> Dict[str, Any]:
+        daily_plan = []
+        for slot, time, meal_index, portion in zip(slots, SLOT_TIMES[meals_per_day], chosen, portions):
+            meal = self.load(int(meal_index))
+            calories, protein, carbs, fat = (self.nutrients[meal_index].astype(np.float64) * portion).round().astype(int)
+            daily_plan.append({
+                "meal": slot.title(),
+                "time": time,
+                "name": meal["name"],
+                "servings": float(portion),
+                "calories": int(calories),
+                "protein_g": int(protein),
+                "carbs_g": int(carbs),
+                "fat_g": int(fat),
+                "ingredients": meal.get("ingredients", [])
+            })
+
+        totals = {
+            key: sum(item[key] for item in daily_plan)
+            for key in ("calories", "protein_g", "carbs_g", "fat_g")
+        }
+        return {
+            "name": f"{goal.replace('_', ' ').title()} Meal Plan",
+            "goal": goal,
+            "daily_calories": totals["calories"],
+            "meals_per_day": meals_per_day,
+            "daily_plan": daily_plan,
+            "totals": totals,
+            "targets": {key: round(value) for key, value in targets.items()},
+            "tips": ["Drink water with every meal", "Prioritise protein at each meal"]
+        }
@@ -0,0 +1,137 @@
+"""
+Query Cache
+===========
+Remembers query vectors and search results for repeated query text.
+
+Plan generation searches with strings built from a few enums
+(f"{fitness_level} {goal} workout exercises", f"{goal} nutrition meals"),
+so the same handful of queries is tokenized, vectorized and scored on
+every request. Keyed on the normalised query text (plus result count and
+filters for results), a repeat costs one dict lookup.
+
+Each IndexSnapshot owns its cache, so a rebuild starts with an empty one
+and nothing computed against the old vocabulary or documents survives.
+A document write keeps the vectors (the vocabulary doesn't change until
+the next merge) but drops the results.
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def normalize_query(text: str, lowercase: bool = True) -> str:
+    """Cache key for query text: case (if the vectorizer ignores it) and spacing don't matter"""
+    text = " ".join(text.split())
+    return text.lower() if lowercase else text
+
+
+class _LRU:
+    """Thread-safe bounded mapping, least recently used entry evicted first"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Any, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Optional[Any]:
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def put(self, key: Any, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: Any, compute: Callable[[], Any]) -> Any:
+        value = self.get(key)
+        if value is None:
+            # Computed outside the lock; two threads missing at once both compute
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class QueryCache:
+    """Query text -> vector, and (query, n_results, filters) -> documents, for one snapshot"""
+
+    def __init__(self, max_entries: int = 1024, lowercase: bool = True, vectors: Optional[_LRU] = None):
+        self.max_entries = max_entries
+        self.lowercase = lowercase
+        self.vectors = vectors if vectors is not None else _LRU(max_entries)
+        self.results = _LRU(max_entries)
+
+    def query_vector(self, text: str, vectorize: Callable[[str], Any]) -> Any:
+        """The cached vector for text, or vectorize(text); callers must not modify it"""
+        return self.vectors.get_or_compute(normalize_query(text, self.lowercase), lambda: vectorize(text))
+
+    def search(
+        self,
+        text: str,
+        n_results: int,
+        filters: Optional[Dict[str, Any]],
+        search: Callable[[], List[str]]
+    ) -> List[str]:
+        """The cached documents for this search, or search()"""
+        key = self._result_key(text, n_results, filters)
+        return list(self.results.get_or_compute(key, lambda: tuple(search())))
+
+    def cached_search(
+        self,
+        text: str,
+        n_results: int,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> Optional[List[str]]:
+        """The cached documents for this search, or None"""
+        documents = self.results.get(self._result_key(text, n_results, filters))
+        return list(documents) if documents is not None else None
+
+    def store_search(
+        self,
+        text: str,
+        n_results: int,
+        filters: Optional[Dict[str, Any]],
+        documents: List[str]
+    ) -> None:
+        self.results.put(self._result_key(text, n_results, filters), tuple(documents))
+
+    def _result_key(self, text: str, n_results: int, filters: Optional[Dict[str, Any]]) -> Tuple[str, int, str]:
+        filters_key = json.dumps(filters, sort_keys=True, default=str) if filters else ""
+        return normalize_query(text, self.lowercase), n_results, filters_key
+
+    def without_results(self) -> "QueryCache":
+        """Cache for a snapshot with different documents but the same vectorizer"""
+        return QueryCache(self.max_entries, self.lowercase, vectors=self.vectors)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.results.hits + self.results.misses
+        return {
+            "vectors": len(self.vectors),
+            "results": len(self.results),
+            "vector_hits": self.vectors.hits,
+            "result_hits": self.results.hits,
+            "result_misses": self.results.misses,
+            "hit_rate": round(self.results.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def create_query_cache(lowercase: bool = True) -> Optional[QueryCache]:
+    """Build the per-snapshot query cache from env vars (None when disabled)"""
+    max_entries = int(os.getenv("RAG_QUERY_CACHE_SIZE", "1024"))
+    if max_entries <= 0:
+        return None
+    return QueryCache(max_entries, lowercase)
@@ -1,29 +1,60 @@
 """
 RAG System - Simple Version
 ===========================
-Uses TF-IDF for search and Google Gemini for generation.
+Uses TF-IDF for search and Google Gemini (or another LLMBackend) for generation.
 No complex dependencies - works out of the box!
 """
 
+import asyncio
 import json
 import os
-from typing import List, Dict, Any, Optional, Tuple
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, AsyncIterator, Callable, Iterable, Iterator, Optional, Sequence, Tuple
 from pathlib import Path
 
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 from dotenv import load_dotenv
 
+import index_store
+import ingest
+from context_packer import estimate_tokens, pack_context
+from custom_documents import CustomDocuments, validate_document
+from document_store import DocumentStore, format_document
+from index_snapshot import IndexSnapshot
+from llm_backends import LLMBackend, create_backend
+from llm_cache import ResponseCache, cache_key, create_response_cache
+from meal_optimizer import MealOptimizer
+from metrics import LLM_ERRORS, PROMPT_TOKENS, SEMANTIC_CACHE_SIMILARITY, STAGE_LATENCY, timed
+from search_engine import InvertedIndex, bm25_idf, bm25_weights, search_batch, term_counts
+from semantic_cache import SemanticCache, create_semantic_cache
+from singleflight import SingleFlight
+from workout_planner import LazyExercises, WorkoutPlanner, exercise_order, first_per_group, planner_order
+
 load_dotenv()
 
-# Try to import the new google-genai package
-try:
-    from google import genai
-    from google.genai import types
-    GENAI_AVAILABLE = True
-except ImportError:
-    GENAI_AVAILABLE = False
+# Start of the user-facing message returned when the LLM call fails
+LLM_ERROR_PREFIX = "I apologize, but I encountered an error."
+
+RANKING_MODES = ("tfidf", "bm25", "bm25f")
+
+# BM25F fields: document line labels -> field, and each field's weight.
+# "body" is the whole document, so labelled fields count on top of it.
+BM25F_FIELDS = {
+    "name": (("Exercise", "Meal", "Topic"), 3.0),
+    "group": (("Muscle Group", "Type", "Category", "Good for"), 2.0),
+    "description": (("Description", "Tip", "Ingredients"), 1.5),
+    "body": ((), 1.0),
+}
+
+# Document type -> (data file stem, array key in the .json file, label);
+# records are read from <stem>.jsonl and/or <stem>.json (see ingest.py)
+DATA_SOURCES = {
+    "exercise": ("workouts", "exercises", "exercises"),
+    "meal": ("nutrition", "meals", "meals"),
+    "tip": ("tips", "tips", "tips"),
+}
 
 
 class RAGSystem:
@@ -37,165 +68,784 @@ class RAGSystem:
     4. Return the response
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        use_prebuilt_index: bool = True,
+        response_cache: Optional[ResponseCache] = None,
+        llm_backend: Optional[LLMBackend] = None,
+        semantic_cache: Optional[SemanticCache] = None,
+        lazy: bool = False
+    ):
         self.is_initialized = False
-        self.documents = []
-        self.doc_metadata = []
-        self.vectorizer = None
-        self.tfidf_matrix = None
-        self.client = None
-
-        self._setup_gemini()
-        self._load_knowledge_base()
-        self._build_search_index()
+        self.init_error: Optional[str] = None
+        self.use_prebuilt_index = use_prebuilt_index
+        # The live index; replaced as a whole by reload(), never modified in place
+        self.snapshot: Optional[IndexSnapshot] = None
+        self.last_reload: Optional[Dict[str, Any]] = None
+        self._reload_lock = threading.Lock()
+
+        # API-managed documents: persisted in data/custom.json, searchable at
+        # once through the snapshot's delta segment, merged into the base
+        # index by a background rebuild once the delta reaches this size
+        self.custom_documents = CustomDocuments(index_store.DATA_PATH / index_store.CUSTOM_FILE)
+        self.delta_merge_docs = int(os.getenv("RAG_DELTA_MERGE_DOCS", "100"))
+        self._write_lock = threading.Lock()
+        # (sequence, doc_id, (document, metadata) or None for a delete) since the last rebuild
+        self._delta_ops: List[Tuple[int, str, Optional[Tuple[str, Dict[str, Any]]]]] = []
+        self._delta_seq = 0
+        self._merge_thread: Optional[threading.Thread] = None
+        self.llm = llm_backend or create_backend()
+        self.response_cache = response_cache or create_response_cache()
+        self.semantic_cache = semantic_cache or create_semantic_cache()
+        self.batch_concurrency = int(os.getenv("RAG_BATCH_CONCURRENCY", "8"))
+
+        # Token budgets for retrieved context in prompts (0 = no limit)
+        self.context_tokens = int(os.getenv("RAG_CONTEXT_TOKENS", "400"))
+        self.plan_context_tokens = int(os.getenv("RAG_PLAN_CONTEXT_TOKENS", "500"))
+
+        # "local": rule-based workout plans from the catalogue; "llm": ask the LLM
+        self.workout_plan_engine = os.getenv("WORKOUT_PLAN_ENGINE", "local").lower()
+        # "local": meal plans optimised against calorie/macro targets; "llm": ask the LLM
+        self.meal_plan_engine = os.getenv("MEAL_PLAN_ENGINE", "local").lower()
+
+        # Identical prompts in flight at the same time share one LLM call
+        coalesce = os.getenv("LLM_SINGLE_FLIGHT", "true").lower() not in ("0", "false", "no")
+        self.llm_flights = SingleFlight() if coalesce else None
+
+        # TF-IDF search is CPU-bound; async callers run it on this bounded
+        # pool so the event loop stays free to multiplex LLM calls.
+        self._search_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("RAG_SEARCH_WORKERS", "4")),
+            thread_name_prefix="rag-search"
+        )
+
+        self.index_dir = Path(os.getenv("RAG_INDEX_DIR", index_store.DEFAULT_INDEX_DIR))
+
+        self.ranking = os.getenv("RAG_RANKING", "tfidf").lower()
+        if self.ranking not in RANKING_MODES:
+            print(f"[WARNING] Unknown RAG_RANKING '{self.ranking}', using tfidf")
+            self.ranking = "tfidf"
+        self.bm25_k1 = float(os.getenv("RAG_BM25_K1", "1.2"))
+        self.bm25_b = float(os.getenv("RAG_BM25_B", "0.75"))
+        # Cosine scores are in [0, 1]; BM25 scores are unbounded, so any match counts
+        self.min_score = 0.05 if self.ranking == "tfidf" else 0.0
+
+        # lazy=True leaves loading the index to warmup(), e.g. in a background thread
+        if not lazy:
+            self.load_index()
+
+    def load_index(self):
+        """Load the prebuilt index, or load the data and build (and save) it"""
+        with self._reload_lock:
+            self.snapshot = self._build_snapshot(self.use_prebuilt_index)
         self.is_initialized = True
 
-    def _setup_gemini(self):
-        """Configure Google Gemini API"""
-        api_key = os.getenv("GEMINI_API_KEY")
+    def _build_snapshot(self, use_prebuilt_index: bool, generation: int = 0) -> Optional[IndexSnapshot]:
+        """Index for the current data files: the prebuilt artifact if it matches, else a fresh build"""
+        fingerprint = index_store.data_fingerprint()
+        snapshot = self._load_prebuilt_index(fingerprint, generation) if use_prebuilt_index else None
+        if snapshot is None:
+            store = self._load_knowledge_base()
+            snapshot = self._build_search_index(store, fingerprint, generation)
+            if snapshot is not None:
+                self._save_prebuilt_index(snapshot)
+        return snapshot
 
-        if not api_key:
-            print("[WARNING] GEMINI_API_KEY not set. Using mock responses.")
-            self.client = None
-            return
+    def reload(self, force: bool = False) -> Dict[str, Any]:
+        """
+        Rebuild the index from the data files and swap it in atomically.
 
-        if not GENAI_AVAILABLE:
-            print("[WARNING] google-genai package not available. Using mock responses.")
-            self.client = None
-            return
+        Requests in flight finish on the snapshot they started with. Skipped
+        when the data files are unchanged, unless force is set.
+        """
+        with self._reload_lock:
+            start = time.perf_counter()
+            current = self.snapshot
+            fingerprint = index_store.data_fingerprint()
+            if not force and current is not None and current.fingerprint == fingerprint:
+                return {"reloaded": False, "reason": "data unchanged", **current.stats()}
+
+            # Every document write up to here is already in data/custom.json
+            with self._write_lock:
+                merged_seq = self._delta_seq
+
+            generation = current.generation + 1 if current is not None else 0
+            with STAGE_LATENCY.time(stage="reload"):
+                # A forced reload refits even if the artifact matches
+                snapshot = self._build_snapshot(self.use_prebuilt_index and not force, generation)
+            if snapshot is None:
+                return {"reloaded": False, "reason": "no documents"}
+
+            with self._write_lock:
+                # Writes that landed during the build go on top of the new
+                # base (replaying a write the build already saw is harmless)
+                self._delta_ops = [op for op in self._delta_ops if op[0] > merged_seq]
+                for _, doc_id, entry in self._delta_ops:
+                    snapshot = self._apply_write(snapshot, doc_id, entry)
+                self.snapshot = snapshot
+            # A reload that succeeds after a failed warmup recovers the service
+            self.is_initialized = True
+            self.init_error = None
+            # Cached answers came from the old documents, and cached query
+            # vectors only make sense for the old vocabulary
+            if self.semantic_cache is not None:
+                self.semantic_cache.clear()
+
+            self.last_reload = {
+                "reloaded": True,
+                "build_seconds": round(time.perf_counter() - start, 3),
+                "previous_documents": current.stats()["documents"] if current is not None else 0,
+                **snapshot.stats()
+            }
+            print(f"[OK] Index reloaded: {snapshot.stats()['documents']} documents "
+                  f"in {self.last_reload['build_seconds']:.2f}s")
+            return self.last_reload
+
+    def upsert_document(self, doc_id: str, doc_type: str, data: Dict[str, Any]) -> bool:
+        """
+        Add or replace an API-managed document; True if it replaced one.
+
+        The document is searchable as soon as this returns. Its terms are
+        weighted with the current vocabulary and IDF until the next merge.
+        """
+        document, metadata = format_document(doc_type, data)
+        replaced = self._write(doc_id, (document, {**metadata, "id": doc_id}),
+                               lambda: self.custom_documents.upsert(doc_id, doc_type, data))
+        if replaced and self.semantic_cache is not None:
+            # Cached answers may quote the old text
+            self.semantic_cache.clear()
+        return replaced
+
+    def delete_document(self, doc_id: str) -> bool:
+        """Remove an API-managed document; False if there was none with that id"""
+        deleted = self._write(doc_id, None, lambda: self.custom_documents.delete(doc_id))
+        if deleted and self.semantic_cache is not None:
+            self.semantic_cache.clear()
+        return deleted
 
+    def sync_custom_documents(self) -> Dict[str, int]:
+        """
+        Apply data/custom.json changes made by other workers to the live index.
+
+        Each worker writes the file and updates only its own snapshot; this
+        diffs the file against the snapshot's API-managed documents and
+        applies the difference as delta writes, without a rebuild.
+        """
+        upserts: List[Tuple[str, Tuple[str, Dict[str, Any]]]] = []
+        with self._write_lock:
+            snapshot = self.snapshot
+            if snapshot is None:
+                return {"upserted": 0, "deleted": 0}
+            live = snapshot.api_documents()
+            saved = set()
+            for entry in self.custom_documents.load():
+                if validate_document(entry["type"], entry["data"]):
+                    continue
+                saved.add(entry["id"])
+                document, metadata = format_document(entry["type"], entry["data"])
+                metadata = {**metadata, "id": entry["id"]}
+                index = live.get(entry["id"])
+                if index is None or snapshot.document(index) != document or snapshot.metadata(index) != metadata:
+                    upserts.append((entry["id"], (document, metadata)))
+            writes = []
+            for doc_id, entry in upserts + [(doc_id, None) for doc_id in live if doc_id not in saved]:
+                try:
+                    snapshot = self._apply_write(snapshot, doc_id, entry)
+                except Exception as e:
+                    print(f"[WARNING] Skipping custom document {doc_id}: {e}")
+                    continue
+                writes.append((doc_id, entry))
+            delta_size = self._publish(snapshot, writes) if writes else 0
+
+        counts = {
+            "upserted": sum(entry is not None for _, entry in writes),
+            "deleted": sum(entry is None for _, entry in writes),
+        }
+        if writes:
+            if self.semantic_cache is not None:
+                self.semantic_cache.clear()
+            print(f"[OK] Synced custom documents: {counts['upserted']} upserted, {counts['deleted']} deleted")
+            if delta_size >= self.delta_merge_docs:
+                self._start_merge()
+        return counts
+
+    def _write(self, doc_id: str, entry: Optional[Tuple[str, Dict[str, Any]]], persist) -> bool:
+        """Persist one document write, then apply it to the live snapshot"""
+        with self._write_lock:
+            # Built first: a document that can't be indexed fails here, before
+            # it is saved or queued for the next merge
+            snapshot = self._apply_write(self.snapshot, doc_id, entry)
+            result = persist()
+            delta_size = 0
+            if entry is not None or result:
+                delta_size = self._publish(snapshot, [(doc_id, entry)])
+
+        if delta_size >= self.delta_merge_docs:
+            self._start_merge()
+        return result
+
+    def _publish(self, snapshot: IndexSnapshot, writes: List[Tuple[str, Optional[Tuple[str, Dict[str, Any]]]]]) -> int:
+        """Swap in snapshot with writes applied (under _write_lock); the resulting delta size"""
+        for doc_id, entry in writes:
+            self._delta_seq += 1
+            self._delta_ops.append((self._delta_seq, doc_id, entry))
+        grew = snapshot.n_terms != self.snapshot.n_terms
+        self.snapshot = snapshot
+        if grew and self.semantic_cache is not None:
+            # Cached query vectors are as wide as the old vocabulary
+            self.semantic_cache.clear()
+        return len(snapshot.delta_documents) + int(snapshot.deleted.sum())
+
+    def _apply_write(
+        self,
+        snapshot: IndexSnapshot,
+        doc_id: str,
+        entry: Optional[Tuple[str, Dict[str, Any]]]
+    ) -> IndexSnapshot:
+        if entry is None:
+            return snapshot.delete(doc_id)
+        document, metadata = entry
+        snapshot = self._with_new_terms(snapshot, document)
+        return snapshot.upsert(doc_id, document, metadata, self._document_weights(snapshot, document))
+
+    def _with_new_terms(self, snapshot: IndexSnapshot, document: str) -> IndexSnapshot:
+        """
+        The snapshot, with the document's words that its vocabulary lacks
+        added as delta-only terms, so a new document matches its own words
+        (a new dish name, say) before the next merge.
+
+        Only single words are added. The merge refits the vocabulary
+        (capped at 5,000 features), so on a large corpus a rare word may
+        drop out again then.
+        """
+        vocabulary = snapshot.vectorizer.vocabulary_
+        terms = sorted({
+            term for term in snapshot.vectorizer.build_analyzer()(document)
+            if " " not in term and term not in vocabulary
+        })
+        if not terms:
+            return snapshot
+        # Smooth IDF (as fitted) of a term in one document
+        idf = np.log((1 + snapshot.n_docs + 1) / 2) + 1
+        return snapshot.extend_vocabulary(terms, np.full(len(terms), idf))
+
+    def _start_merge(self):
+        """Fold the delta segment into a freshly fitted base index in the background"""
+        with self._write_lock:
+            if self._merge_thread is not None and self._merge_thread.is_alive():
+                return
+            self._merge_thread = threading.Thread(target=self._merge, name="rag-merge", daemon=True)
+            self._merge_thread.start()
+
+    def _merge(self):
         try:
-            self.client = genai.Client(api_key=api_key)
-            print("[OK] Gemini API configured")
+            self.reload()
         except Exception as e:
-            print(f"[ERROR] Gemini setup error: {e}")
-            self.client = None
+            print(f"[ERROR] Delta merge failed: {e}")
 
-    def _load_knowledge_base(self):
-        """Load fitness data from JSON files"""
+    def warmup(self):
+        """Warm the LLM client, then load the index if needed; index errors are kept in init_error"""
+        with STAGE_LATENCY.time(stage="warmup"):
+            try:
+                self.llm.warmup()
+            except Exception as e:
+                # Not fatal: LLM calls fail (and are counted) on their own
+                print(f"[WARNING] LLM warmup failed: {e}")
+            if self.is_initialized:
+                return
+            try:
+                self.load_index()
+                print("[OK] RAG system ready")
+            except Exception as e:
+                self.init_error = f"{type(e).__name__}: {e}"
+                print(f"[ERROR] Index load failed: {self.init_error}")
+
+    def _iter_knowledge_base(self) -> Iterator[Tuple[str, Dict[str, Any], Optional[str]]]:
+        """Stream (doc_type, record, id) for every record in the data files, then the custom documents"""
         data_path = Path(__file__).parent / "data"
+        for doc_type, (stem, key, label) in DATA_SOURCES.items():
+            count = 0
+            for record in ingest.iter_source(data_path, stem, key):
+                yield doc_type, record, None
+                count += 1
+            if count:
+                print(f"  [OK] Loaded {count} {label}")
 
-        # Load workouts
-        workouts_file = data_path / "workouts.json"
-        if workouts_file.exists():
-            with open(workouts_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            for exercise in data.get("exercises", []):
-                doc = f"""
-Exercise: {exercise['name']}
-Muscle Group: {exercise.get('muscle_group', 'N/A')}
-Difficulty: {exercise.get('difficulty', 'N/A')}
-Description: {exercise.get('description', '')}
-Instructions: {exercise.get('instructions', '')}
-Sets: {exercise.get('sets', 'N/A')} | Reps: {exercise.get('reps', 'N/A')}
-Equipment: {exercise.get('equipment', 'None')}
-"""
-                self.documents.append(doc)
-                self.doc_metadata.append({"type": "exercise", "name": exercise['name']})
-            print(f"  [OK] Loaded {len(data.get('exercises', []))} exercises")
-
-        # Load nutrition
-        nutrition_file = data_path / "nutrition.json"
-        if nutrition_file.exists():
-            with open(nutrition_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            for meal in data.get("meals", []):
-                doc = f"""
-Meal: {meal['name']}
-Type: {meal.get('type', 'N/A')}
-Calories: {meal.get('calories', 'N/A')} kcal
-Protein: {meal.get('protein', 'N/A')}g | Carbs: {meal.get('carbs', 'N/A')}g | Fat: {meal.get('fat', 'N/A')}g
-Ingredients: {', '.join(meal.get('ingredients', []))}
-Good for: {', '.join(meal.get('goal', []))}
-Preparation: {meal.get('preparation', '')}
-"""
-                self.documents.append(doc)
-                self.doc_metadata.append({"type": "meal", "name": meal['name']})
-            print(f"  [OK] Loaded {len(data.get('meals', []))} meals")
-
-        # Load tips
-        tips_file = data_path / "tips.json"
-        if tips_file.exists():
-            with open(tips_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            for tip in data.get("tips", []):
-                doc = f"""
-Topic: {tip.get('topic', 'General')}
-Category: {tip.get('category', 'general')}
-Tip: {tip['content']}
-"""
-                self.documents.append(doc)
-                self.doc_metadata.append({"type": "tip", "topic": tip.get('topic', '')})
-            print(f"  [OK] Loaded {len(data.get('tips', []))} tips")
+        # Documents added through the API; one saved before validation was
+        # stricter is skipped rather than failing the whole build
+        count = 0
+        for entry in self.custom_documents.load():
+            problem = validate_document(entry["type"], entry["data"])
+            if problem:
+                print(f"  [WARNING] Skipping custom document {entry['id']}: {problem}")
+                continue
+            yield entry["type"], entry["data"], entry["id"]
+            count += 1
+        if count:
+            print(f"  [OK] Loaded {count} custom documents")
 
-        print(f"[OK] Knowledge base loaded: {len(self.documents)} total documents")
+    def _load_knowledge_base(self) -> DocumentStore:
+        """Load fitness data from the data files into a compact document store"""
+        store = DocumentStore.build(self._iter_knowledge_base())
+        print(f"[OK] Knowledge base loaded: {len(store)} total documents "
+              f"({store.nbytes / 1e6:.1f} MB)")
+        return store
 
-    def _build_search_index(self):
+    def _build_search_index(
+        self,
+        store: DocumentStore,
+        fingerprint: str,
+        generation: int = 0
+    ) -> Optional[IndexSnapshot]:
         """Build TF-IDF search index"""
-        if not self.documents:
+        if not len(store):
             print("[WARNING] No documents to index")
-            return
+            return None
+
+        # Only the stop word list comes from scikit-learn; serving from the
+        # prebuilt artifact never imports it (see text_vectorizer.py)
+        from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
 
-        self.vectorizer = TfidfVectorizer(
-            stop_words='english',
+        # Same result as TfidfVectorizer(stop_words='english', ngram_range=(1, 2),
+        # max_features=5000).fit_transform, vectorized in chunks (see ingest.py)
+        vectorizer, tfidf_matrix = ingest.fit_tfidf(
+            store.documents,
+            stop_words=ENGLISH_STOP_WORDS,
             ngram_range=(1, 2),
             max_features=5000
         )
-        self.tfidf_matrix = self.vectorizer.fit_transform(self.documents)
-        print("[OK] Search index built")
+        if self.ranking == "tfidf":
+            search_index = InvertedIndex(tfidf_matrix)
+        else:
+            search_index = InvertedIndex(self._bm25_matrix(store.documents, vectorizer))
+        print(f"[OK] Search index built ({self.ranking})")
+        return IndexSnapshot(
+            store, vectorizer, tfidf_matrix, search_index, fingerprint, generation
+        )
+
+    def _bm25_matrix(
+        self,
+        documents: Callable[[], Iterable[str]],
+        vectorizer: Any,
+        idf: Optional[np.ndarray] = None
+    ):
+        """
+        BM25 (whole document) or BM25F (labelled fields) weights over the TF-IDF vocabulary
+
+        documents() must return a fresh iterable of texts on each call.
 
-    def _search(self, query: str, n_results: int = 5) -> List[str]:
-        """Search for relevant documents using TF-IDF similarity"""
-        if self.vectorizer is None or self.tfidf_matrix is None:
+        With idf (documents added to an existing index) length normalisation
+        is skipped, since the corpus average lengths aren't kept; the next
+        merge weights them properly.
+        """
+        analyzer = vectorizer.build_analyzer()
+        vocabulary = vectorizer.vocabulary_
+        b = self.bm25_b if idf is None else 0.0
+
+        if self.ranking == "bm25":
+            counts, lengths = term_counts(documents(), analyzer, vocabulary)
+            return bm25_weights([(counts, lengths, 1.0)], k1=self.bm25_k1, b=b, idf=idf)
+
+        fields = []
+        for field, (_, weight) in BM25F_FIELDS.items():
+            texts = (self._document_fields(doc)[field] for doc in documents())
+            counts, lengths = term_counts(texts, analyzer, vocabulary)
+            fields.append((counts, lengths, weight))
+        return bm25_weights(fields, k1=self.bm25_k1, b=b, idf=idf)
+
+    def _document_weights(self, snapshot: IndexSnapshot, document: str):
+        """A new document's row in the same weighting as the snapshot's postings"""
+        if self.ranking == "tfidf":
+            return snapshot.vectorizer.transform([document])
+        index = snapshot.search_index
+        # Delta-only terms appear in (about) one document
+        doc_freq = np.ones(snapshot.n_terms, dtype=index.doc_freq.dtype)
+        doc_freq[:index.n_terms] = index.doc_freq
+        return self._bm25_matrix(lambda: [document], snapshot.vectorizer, bm25_idf(doc_freq, index.n_docs))
+
+    @staticmethod
+    def _document_fields(document: str) -> Dict[str, str]:
+        """Split a formatted document ("Label: value" lines) into BM25F fields"""
+        labels = {label: field for field, (names, _) in BM25F_FIELDS.items() for label in names}
+        fields = {field: [] for field in BM25F_FIELDS}
+        for line in document.strip().splitlines():
+            label, _, value = line.partition(":")
+            if label.strip() in labels:
+                fields[labels[label.strip()]].append(value)
+        fields = {field: " ".join(values) for field, values in fields.items()}
+        fields["body"] = document
+        return fields
+
+    def _ranking_settings(self) -> Dict[str, Any]:
+        """Ranking configuration baked into the index postings (recorded in the artifact)"""
+        if self.ranking == "tfidf":
+            return {"mode": "tfidf"}
+        settings = {"mode": self.ranking, "k1": self.bm25_k1, "b": self.bm25_b}
+        if self.ranking == "bm25f":
+            settings["fields"] = {field: weight for field, (_, weight) in BM25F_FIELDS.items()}
+        return settings
+
+    def _query_weights(self, query_vector):
+        """Per-term query weights for the active ranking (BM25 counts each query term once)"""
+        if self.ranking == "tfidf":
+            return query_vector
+        query_vector = query_vector.copy()
+        query_vector.data[:] = 1.0
+        return query_vector
+
+    def _load_prebuilt_index(self, fingerprint: str, generation: int = 0) -> Optional[IndexSnapshot]:
+        """Load the prebuilt index artifact if it matches the current data files"""
+        try:
+            artifact = index_store.load_index(self.index_dir, fingerprint, self._ranking_settings())
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[WARNING] Could not load prebuilt index: {e}")
+            return None
+
+        if artifact is None:
+            print("[INFO] No up-to-date prebuilt index, rebuilding from data files")
+            return None
+
+        print(f"[OK] Prebuilt index loaded: {len(artifact['store'])} documents")
+        return IndexSnapshot(
+            artifact["store"], artifact["vectorizer"],
+            artifact["tfidf_matrix"], artifact["search_index"], fingerprint, generation,
+            doc_columns=artifact["doc_columns"]
+        )
+
+    def _save_prebuilt_index(self, snapshot: IndexSnapshot) -> bool:
+        """Persist the freshly built index so the next start can skip rebuilding"""
+        try:
+            index_store.save_index(
+                self.index_dir, snapshot.fingerprint, snapshot.store, snapshot.doc_columns,
+                snapshot.vectorizer, snapshot.tfidf_matrix, snapshot.search_index,
+                ranking=self._ranking_settings()
+            )
+            print(f"[OK] Index saved to {self.index_dir}")
+            return True
+        except OSError as e:
+            print(f"[WARNING] Could not save index: {e}")
+            return False
+
+    @timed("search")
+    def _search(self, query: str, n_results: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[str]:
+        """
+        Search for relevant documents using TF-IDF similarity
+
+        filters are passed to DocumentColumns.mask() (e.g. doc_type="meal",
+        goals=[...]) and restrict which documents are scored at all.
+        """
+        snapshot = self.snapshot
+        if snapshot is None:
             return []
+        return self._search_text(snapshot, query, n_results, filters)
+
+    def _search_text(
+        self,
+        snapshot: IndexSnapshot,
+        query: str,
+        n_results: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[str]:
+        """Search one snapshot by query text; repeated searches come from its query cache"""
+        cache = snapshot.query_cache
+        if cache is None:
+            return self._search_vector(snapshot, self._query_vector(snapshot, query), n_results, filters)
+        return cache.search(
+            query, n_results, filters,
+            lambda: self._search_vector(snapshot, self._query_vector(snapshot, query), n_results, filters)
+        )
+
+    @staticmethod
+    def _query_vector(snapshot: IndexSnapshot, query: str):
+        """A query's vector under a snapshot's vectorizer (cached per snapshot; don't modify it)"""
+        if snapshot.query_cache is None:
+            return snapshot.vectorizer.transform([query])
+        return snapshot.query_cache.query_vector(query, lambda text: snapshot.vectorizer.transform([text]))
+
+    def _search_vector(
+        self,
+        snapshot: IndexSnapshot,
+        query_vector,
+        n_results: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[str]:
+        """Search one snapshot with a query vectorized by that snapshot (see _search)"""
+        doc_mask = snapshot.mask(filters)
+
+        # TF-IDF rows and the query are L2-normalised, so the postings
+        # dot product is the cosine similarity; for BM25 it is the BM25 score.
+        hits = snapshot.search(
+            self._query_weights(query_vector), n_results, min_score=self.min_score, doc_mask=doc_mask
+        )
+
+        if filters and len(hits) < n_results:
+            # The filters already guarantee relevance, so top up with
+            # matching documents the query text didn't score
+            seen = {idx for idx, _ in hits}
+            extra = [idx for idx in np.flatnonzero(doc_mask)[:n_results + len(seen)] if idx not in seen]
+            hits += [(idx, 0.0) for idx in extra[:n_results - len(hits)]]
 
-        query_vector = self.vectorizer.transform([query])
-        similarities = cosine_similarity(query_vector, self.tfidf_matrix).flatten()
+        return [snapshot.document(idx) for idx, _ in hits]
 
-        # Get top N results
-        top_indices = similarities.argsort()[-n_results:][::-1]
+    @timed("search")
+    def _search_batch(self, queries: List[str], n_results: int = 5) -> List[List[str]]:
+        """Search for many queries with one transform and one sparse matrix product"""
+        snapshot = self.snapshot
+        if snapshot is None or not queries:
+            return [[] for _ in queries]
 
-        results = []
-        for idx in top_indices:
-            if similarities[idx] > 0.05:  # Only include if similarity > threshold
-                results.append(self.documents[idx])
+        # Queries searched before (with the same n_results, no filters) come
+        # from the query cache; the rest share one transform and one product
+        cache = snapshot.query_cache
+        results = [cache.cached_search(query, n_results) if cache is not None else None for query in queries]
+        misses = [i for i, documents in enumerate(results) if documents is None]
+        if not misses:
+            return results
 
+        query_matrix = self._query_weights(snapshot.vectorizer.transform([queries[i] for i in misses]))
+        hits = search_batch(query_matrix, snapshot.doc_term_matrix, n_results, min_score=self.min_score)
+        for i, row in zip(misses, hits):
+            results[i] = [snapshot.document(idx) for idx, _ in row]
+            if cache is not None:
+                cache.store_search(queries[i], n_results, None, results[i])
         return results
 
+    async def _asearch(self, query: str, n_results: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[str]:
+        """Run _search on the search thread pool without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._search_executor, self._search, query, n_results, filters)
+
+    @timed("search")
+    def _retrieve_for_query(self, question: str) -> Tuple[Any, Optional[Tuple[str, List[str]]], List[str]]:
+        """
+        Vectorize a chat question once for both the semantic cache and search.
+
+        Returns (semantic key, cached (response, sources) or None, documents);
+        documents are only searched on a cache miss. Pass the key to
+        _semantic_cache_set to remember the answer.
+        """
+        # Read the cache generation before the snapshot: if a reload swaps
+        # the snapshot after this point, the generation is stale as well
+        # and the answer is not cached against the new index
+        generation = self.semantic_cache.generation if self.semantic_cache is not None else 0
+        snapshot = self.snapshot
+        if snapshot is None:
+            return None, None, []
+
+        query_vector = self._query_vector(snapshot, question)
+        semantic_key = (query_vector, generation)
+        if self.semantic_cache is not None and self.llm.cacheable:
+            hit = self.semantic_cache.get(query_vector)
+            if hit is not None:
+                response, sources, similarity = hit
+                SEMANTIC_CACHE_SIMILARITY.observe(similarity)
+                return semantic_key, (response, sources), []
+
+        return semantic_key, None, self._search_text(snapshot, question, n_results=5)
+
+    async def _aretrieve_for_query(self, question: str) -> Tuple[Any, Optional[Tuple[str, List[str]]], List[str]]:
+        """Run _retrieve_for_query on the search thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._search_executor, self._retrieve_for_query, question)
+
+    def _semantic_cache_set(self, semantic_key, response: str, sources: List[str]):
+        """Remember a chat answer for similar future questions (errors are never cached)"""
+        if (self.semantic_cache is None or semantic_key is None or not self.llm.cacheable
+                or not response or response.startswith(LLM_ERROR_PREFIX)):
+            return
+        query_vector, generation = semantic_key
+        self.semantic_cache.set(query_vector, response, sources, generation=generation)
+
+    def _exercise_filters(self, fitness_level: str, equipment: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Retrieval filters for exercises suitable for a level (and equipment, if given)"""
+        return {"doc_type": "exercise", "max_difficulty": fitness_level, "equipment": equipment}
+
+    def _meal_filters(self, goal: str, restrictions: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Retrieval filters for meals matching a goal and dietary restrictions"""
+        return {"doc_type": "meal", "goals": [goal], "restrictions": restrictions}
+
+    def _pack_context(self, documents: List[str], max_tokens: int, separator: str = "\n---\n") -> str:
+        """Fit ranked documents into a prompt token budget (see context_packer.py)"""
+        if max_tokens <= 0:
+            return separator.join(doc.strip() for doc in documents)
+        return pack_context(documents, max_tokens, separator)
+
     def _generate_with_llm(self, prompt: str) -> str:
-        """Generate response using Gemini LLM"""
-        if not self.client:
-            return self._mock_response(prompt)
+        """Generate response using the configured LLM backend"""
+        PROMPT_TOKENS.observe(estimate_tokens(prompt))
+        key = self._cache_key(prompt)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
 
         try:
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=prompt
-            )
-            return response.text
+            # Timed here so cache hits don't pull the backend latency down
+            with STAGE_LATENCY.time(stage="llm"):
+                response = self.llm.generate(prompt)
+            self._cache_set(key, response)
+            return response
         except Exception as e:
+            LLM_ERRORS.inc()
             print(f"[ERROR] LLM Error: {e}")
-            return f"I apologize, but I encountered an error. Error: {str(e)}"
+            return f"{LLM_ERROR_PREFIX} Error: {str(e)}"
+
+    async def _agenerate_with_llm(self, prompt: str) -> str:
+        """Generate response using the backend's async API"""
+        PROMPT_TOKENS.observe(estimate_tokens(prompt))
+        key = self._cache_key(prompt)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        async def call_llm() -> str:
+            try:
+                # Once per backend call: cache hits and coalesced callers aren't timed
+                with STAGE_LATENCY.time(stage="llm"):
+                    response = await self.llm.agenerate(prompt)
+            except Exception:
+                # Counted here so a coalesced failure is counted once
+                LLM_ERRORS.inc()
+                raise
+            self._cache_set(key, response)
+            return response
+
+        try:
+            if self.llm_flights is None:
+                return await call_llm()
+            return await self.llm_flights.do(cache_key(self.llm.model_name, prompt), call_llm)
+        except Exception as e:
+            print(f"[ERROR] LLM Error: {e}")
+            return f"{LLM_ERROR_PREFIX} Error: {str(e)}"
+
+    async def _astream_with_llm(self, prompt: str) -> AsyncIterator[str]:
+        """Stream response text chunks from the LLM backend; a failed call raises after any partial output"""
+        PROMPT_TOKENS.observe(estimate_tokens(prompt))
+        key = self._cache_key(prompt)
+        cached = self._cache_get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        start = time.perf_counter()
+        try:
+            async for chunk in self.llm.astream(prompt):
+                if not parts:
+                    STAGE_LATENCY.observe(time.perf_counter() - start, stage="llm_first_token")
+                parts.append(chunk)
+                yield chunk
+        except Exception as e:
+            # Raised rather than sent as text, so clients can tell it from an answer
+            LLM_ERRORS.inc()
+            print(f"[ERROR] LLM Error: {e}")
+            raise
+
+        STAGE_LATENCY.observe(time.perf_counter() - start, stage="llm_stream")
+        self._cache_set(key, "".join(parts))
 
-    def _mock_response(self, prompt: str) -> str:
-        """Mock response when Gemini is not configured"""
-        return """I'm SmartCoach AI! To enable full AI responses:
-1. Get a free Gemini API key from https://aistudio.google.com/app/apikey
-2. Add it to your .env file as GEMINI_API_KEY=your-key
+    def _cache_key(self, prompt: str) -> Optional[str]:
+        """Response cache key for a prompt, or None if the backend isn't cacheable"""
+        if self.response_cache is None or not self.llm.cacheable:
+            return None
+        return cache_key(self.llm.model_name, prompt)
 
-For now, here's a tip: Stay consistent with your workouts and focus on proper nutrition!"""
+    def _cache_get(self, key: Optional[str]) -> Optional[str]:
+        """Look up a cached LLM response"""
+        if key is None:
+            return None
+        return self.response_cache.get(key)
+
+    def _cache_set(self, key: Optional[str], response: Optional[str]):
+        """Store a successful LLM response (error messages are never cached)"""
+        if key is None or not response:
+            return
+        self.response_cache.set(key, response)
 
     def query(self, question: str, context: Optional[Dict] = None) -> Tuple[str, List[str]]:
         """
         Answer a fitness/nutrition question using RAG
         """
-        # Search for relevant information
-        relevant_docs = self._search(question, n_results=5)
+        # Similar question answered before? Otherwise search for relevant information
+        semantic_key, cached, relevant_docs = self._retrieve_for_query(question)
+        if cached is not None:
+            return cached
+
+        prompt = self._build_query_prompt(question, relevant_docs)
+        response = self._generate_with_llm(prompt)
+        self._semantic_cache_set(semantic_key, response, relevant_docs[:3])
+        return response, relevant_docs[:3]
+
+    async def aquery(self, question: str, context: Optional[Dict] = None) -> Tuple[str, List[str]]:
+        """Async version of query() for use from FastAPI handlers"""
+        semantic_key, cached, relevant_docs = await self._aretrieve_for_query(question)
+        if cached is not None:
+            return cached
+
+        prompt = self._build_query_prompt(question, relevant_docs)
+        response = await self._agenerate_with_llm(prompt)
+        self._semantic_cache_set(semantic_key, response, relevant_docs[:3])
+        return response, relevant_docs[:3]
+
+    async def aquery_batch(
+        self,
+        questions: List[str],
+        max_concurrency: Optional[int] = None
+    ) -> List[Tuple[str, List[str]]]:
+        """
+        Answer many questions: one vectorized retrieval pass, then LLM calls
+        run concurrently (at most max_concurrency at a time).
+
+        Results are returned in input order.
+        """
+        loop = asyncio.get_running_loop()
+        docs_per_question = await loop.run_in_executor(
+            self._search_executor, self._search_batch, questions, 5
+        )
+
+        limit = min(max_concurrency or self.batch_concurrency, self.batch_concurrency)
+        semaphore = asyncio.Semaphore(max(limit, 1))
+
+        async def answer(question: str, relevant_docs: List[str]) -> Tuple[str, List[str]]:
+            prompt = self._build_query_prompt(question, relevant_docs)
+            async with semaphore:
+                response = await self._agenerate_with_llm(prompt)
+            return response, relevant_docs[:3]
+
+        return await asyncio.gather(*(
+            answer(question, docs) for question, docs in zip(questions, docs_per_question)
+        ))
+
+    async def aquery_stream(self, question: str, context: Optional[Dict] = None) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Streaming version of query().
+
+        Yields ("sources", docs) once retrieval is done, then ("token", text)
+        for each chunk of the LLM response as it arrives. If the LLM call
+        fails, the exception propagates after any tokens already yielded.
+        """
+        semantic_key, cached, relevant_docs = await self._aretrieve_for_query(question)
+        if cached is not None:
+            response, sources = cached
+            yield "sources", sources
+            yield "token", response
+            return
+
+        yield "sources", relevant_docs[:3]
 
-        # Build the prompt
-        context_text = "\n---\n".join(relevant_docs) if relevant_docs else "No specific information found in knowledge base."
+        prompt = self._build_query_prompt(question, relevant_docs)
+        parts = []
+        async for chunk in self._astream_with_llm(prompt):
+            parts.append(chunk)
+            yield "token", chunk
+        if parts:
+            self._semantic_cache_set(semantic_key, "".join(parts), relevant_docs[:3])
 
-        prompt = f"""You are SmartCoach, a knowledgeable and friendly fitness and nutrition AI assistant.
+    @timed("prompt")
+    def _build_query_prompt(self, question: str, relevant_docs: List[str]) -> str:
+        """Build the chat prompt from the question and retrieved documents"""
+        context_text = self._pack_context(relevant_docs, self.context_tokens) if relevant_docs else "No specific information found in knowledge base."
+
+        return f"""You are SmartCoach, a knowledgeable and friendly fitness and nutrition AI assistant.
 
 RELEVANT INFORMATION FROM KNOWLEDGE BASE:
 {context_text}
@@ -212,9 +862,6 @@ INSTRUCTIONS:
 
 YOUR RESPONSE:"""
 
-        response = self._generate_with_llm(prompt)
-        return response, relevant_docs[:3]
-
     def generate_fitness_plan(
         self,
         goal: str,
@@ -224,10 +871,59 @@ YOUR RESPONSE:"""
     ) -> Dict[str, Any]:
         """Generate a complete fitness plan"""
 
-        workout_docs = self._search(f"{fitness_level} {goal} workout exercises", n_results=8)
-        nutrition_docs = self._search(f"{goal} nutrition meals", n_results=8)
+        workout_docs = self._search(
+            f"{fitness_level} {goal} workout exercises", n_results=8,
+            filters=self._exercise_filters(fitness_level)
+        )
+        nutrition_docs = self._search(
+            f"{goal} nutrition meals", n_results=8,
+            filters=self._meal_filters(goal)
+        )
+
+        prompt = self._build_fitness_plan_prompt(
+            goal, fitness_level, preferences, duration_weeks, workout_docs, nutrition_docs
+        )
+        response = self._generate_with_llm(prompt)
+        return self._parse_fitness_plan(response, goal, duration_weeks)
+
+    async def agenerate_fitness_plan(
+        self,
+        goal: str,
+        fitness_level: str,
+        preferences: Optional[Dict] = None,
+        duration_weeks: int = 4
+    ) -> Dict[str, Any]:
+        """Async version of generate_fitness_plan()"""
+
+        workout_docs, nutrition_docs = await asyncio.gather(
+            self._asearch(
+                f"{fitness_level} {goal} workout exercises", n_results=8,
+                filters=self._exercise_filters(fitness_level)
+            ),
+            self._asearch(
+                f"{goal} nutrition meals", n_results=8,
+                filters=self._meal_filters(goal)
+            )
+        )
+
+        prompt = self._build_fitness_plan_prompt(
+            goal, fitness_level, preferences, duration_weeks, workout_docs, nutrition_docs
+        )
+        response = await self._agenerate_with_llm(prompt)
+        return self._parse_fitness_plan(response, goal, duration_weeks)
 
-        prompt = f"""You are SmartCoach AI creating a personalized fitness plan.
+    @timed("prompt")
+    def _build_fitness_plan_prompt(
+        self,
+        goal: str,
+        fitness_level: str,
+        preferences: Optional[Dict],
+        duration_weeks: int,
+        workout_docs: List[str],
+        nutrition_docs: List[str]
+    ) -> str:
+        """Build the fitness plan prompt"""
+        return f"""You are SmartCoach AI creating a personalized fitness plan.
 
 USER PROFILE:
 - Goal: {goal}
@@ -236,10 +932,10 @@ USER PROFILE:
 - Preferences: {preferences or 'None specified'}
 
 AVAILABLE EXERCISES:
-{chr(10).join(workout_docs[:5])}
+{self._pack_context(workout_docs[:5], self.plan_context_tokens // 2, separator=chr(10) * 2)}
 
 AVAILABLE MEALS:
-{chr(10).join(nutrition_docs[:5])}
+{self._pack_context(nutrition_docs[:5], self.plan_context_tokens // 2, separator=chr(10) * 2)}
 
 Create a structured {duration_weeks}-week fitness plan. Return ONLY valid JSON:
 {{
@@ -265,7 +961,8 @@ Create a structured {duration_weeks}-week fitness plan. Return ONLY valid JSON:
     "tips": ["Tip 1", "Tip 2"]
 }}"""
 
-        response = self._generate_with_llm(prompt)
+    def _parse_fitness_plan(self, response: str, goal: str, duration_weeks: int) -> Dict[str, Any]:
+        """Parse the fitness plan response"""
         return self._parse_json_response(response, {
             "plan_name": f"{goal.replace('_', ' ').title()} Plan",
             "goal": goal,
@@ -279,14 +976,145 @@ Create a structured {duration_weeks}-week fitness plan. Return ONLY valid JSON:
         goal: str,
         equipment: Optional[List[str]] = None,
         duration: int = 45,
-        days_per_week: int = 3
+        days_per_week: int = 3,
+        include_notes: bool = False
     ) -> Dict[str, Any]:
         """Generate a workout plan"""
+        if self.workout_plan_engine == "local":
+            plan = self._local_workout_plan(fitness_level, goal, equipment, duration, days_per_week)
+            if plan is not None:
+                if include_notes:
+                    self._add_plan_notes(plan, self._generate_with_llm(
+                        self._build_workout_notes_prompt(fitness_level, goal, plan)
+                    ))
+                return plan
 
         equipment_str = ', '.join(equipment) if equipment else 'bodyweight only'
-        relevant_docs = self._search(f"{fitness_level} {goal} exercises {equipment_str}", n_results=10)
+        relevant_docs = self._search(
+            f"{fitness_level} {goal} exercises", n_results=10,
+            filters=self._exercise_filters(fitness_level, equipment or [])
+        )
 
-        prompt = f"""Create a workout plan:
+        prompt = self._build_workout_plan_prompt(
+            fitness_level, goal, equipment_str, duration, days_per_week, relevant_docs
+        )
+        response = self._generate_with_llm(prompt)
+        return self._parse_workout_plan(response, goal, days_per_week)
+
+    async def agenerate_workout_plan(
+        self,
+        fitness_level: str,
+        goal: str,
+        equipment: Optional[List[str]] = None,
+        duration: int = 45,
+        days_per_week: int = 3,
+        include_notes: bool = False
+    ) -> Dict[str, Any]:
+        """Async version of generate_workout_plan()"""
+        if self.workout_plan_engine == "local":
+            # CPU-bound like search: keep it off the event loop
+            loop = asyncio.get_running_loop()
+            plan = await loop.run_in_executor(
+                self._search_executor, self._local_workout_plan, fitness_level, goal, equipment, duration, days_per_week
+            )
+            if plan is not None:
+                if include_notes:
+                    self._add_plan_notes(plan, await self._agenerate_with_llm(
+                        self._build_workout_notes_prompt(fitness_level, goal, plan)
+                    ))
+                return plan
+
+        equipment_str = ', '.join(equipment) if equipment else 'bodyweight only'
+        relevant_docs = await self._asearch(
+            f"{fitness_level} {goal} exercises", n_results=10,
+            filters=self._exercise_filters(fitness_level, equipment or [])
+        )
+
+        prompt = self._build_workout_plan_prompt(
+            fitness_level, goal, equipment_str, duration, days_per_week, relevant_docs
+        )
+        response = await self._agenerate_with_llm(prompt)
+        return self._parse_workout_plan(response, goal, days_per_week)
+
+    @timed("planner")
+    def _local_workout_plan(
+        self,
+        fitness_level: str,
+        goal: str,
+        equipment: Optional[List[str]],
+        duration: int,
+        days_per_week: int
+    ) -> Optional[Dict[str, Any]]:
+        """Rule-based plan from the exercise catalogue, or None if no exercise fits the filters"""
+        snapshot = self.snapshot
+        if snapshot is None:
+            return None
+
+        rows = np.flatnonzero(snapshot.mask(self._exercise_filters(fitness_level, equipment or [])))
+        by_group = self._plan_exercises(snapshot, rows)
+        if not by_group:
+            return None
+
+        plan = WorkoutPlanner.from_groups(by_group).plan(goal, days_per_week, duration)
+        if not any(workout["exercises"] for workout in plan["workouts"]):
+            return None
+        return plan
+
+    @staticmethod
+    def _plan_exercises(snapshot: IndexSnapshot, rows: np.ndarray) -> Dict[str, Sequence[Dict[str, Any]]]:
+        """
+        Matching exercises by muscle group in planner order, decoded only
+        when the planner reaches them.
+
+        Each group's first exercises are picked from the base columns
+        (difficulty and name rank), so the cost doesn't grow with the
+        catalogue. Delta documents have no rank among the base names and
+        are merged in by their metadata.
+        """
+        base, delta = rows[rows < snapshot.n_base], rows[rows >= snapshot.n_base]
+        columns = snapshot.doc_columns
+        order = planner_order(columns.difficulty[base], columns.name_rank[base], base)
+
+        by_group: Dict[str, Sequence[Dict[str, Any]]] = {}
+        for code, positions in first_per_group(columns.muscle_group[base], order).items():
+            group = columns.muscle_groups[code] if code >= 0 else "other"
+            by_group[group] = LazyExercises(base[positions], snapshot.metadata)
+        for index in delta:
+            exercise = snapshot.metadata(int(index))
+            group = exercise.get("muscle_group") or "other"
+            by_group[group] = sorted([*by_group.get(group, []), exercise], key=exercise_order)
+        return by_group
+
+    @timed("prompt")
+    def _build_workout_notes_prompt(self, fitness_level: str, goal: str, plan: Dict[str, Any]) -> str:
+        """Prompt asking the LLM for short coaching notes on a finished plan"""
+        schedule = "\n".join(
+            f"Day {w['day']} ({w['name']}): " + ", ".join(e["name"] for e in w["exercises"])
+            for w in plan["workouts"]
+        )
+        return f"""You are SmartCoach AI. Write 3-5 short coaching notes (plain text, one per line)
+for this {fitness_level} {goal} workout plan: progression, form cues and recovery.
+Do not change the exercises.
+
+{schedule}"""
+
+    def _add_plan_notes(self, plan: Dict[str, Any], notes: str):
+        """Attach LLM coaching notes to a local plan (skipped if the LLM call failed)"""
+        if notes and not notes.startswith(LLM_ERROR_PREFIX):
+            plan["notes"] = notes.strip()
+
+    @timed("prompt")
+    def _build_workout_plan_prompt(
+        self,
+        fitness_level: str,
+        goal: str,
+        equipment_str: str,
+        duration: int,
+        days_per_week: int,
+        relevant_docs: List[str]
+    ) -> str:
+        """Build the workout plan prompt"""
+        return f"""Create a workout plan:
 - Fitness Level: {fitness_level}
 - Goal: {goal}
 - Equipment: {equipment_str}
@@ -294,7 +1122,7 @@ Create a structured {duration_weeks}-week fitness plan. Return ONLY valid JSON:
 - Days per Week: {days_per_week}
 
 EXERCISE DATABASE:
-{chr(10).join(relevant_docs[:7])}
+{self._pack_context(relevant_docs[:7], self.plan_context_tokens, separator=chr(10) * 2)}
 
 Return ONLY valid JSON:
 {{
@@ -314,7 +1142,8 @@ Return ONLY valid JSON:
     ]
 }}"""
 
-        response = self._generate_with_llm(prompt)
+    def _parse_workout_plan(self, response: str, goal: str, days_per_week: int) -> Dict[str, Any]:
+        """Parse the workout plan response"""
         return self._parse_json_response(response, {
             "name": f"{goal.title()} Workout Plan",
             "days_per_week": days_per_week,
@@ -326,22 +1155,117 @@ Return ONLY valid JSON:
         goal: str,
         restrictions: Optional[List[str]] = None,
         calories: Optional[int] = None,
-        meals_per_day: int = 3
+        meals_per_day: int = 3,
+        include_notes: bool = False
     ) -> Dict[str, Any]:
         """Generate a meal/nutrition plan"""
+        if self.meal_plan_engine == "local":
+            plan = self._local_meal_plan(goal, restrictions, calories, meals_per_day)
+            if plan is not None:
+                if include_notes:
+                    self._add_plan_notes(plan, self._generate_with_llm(
+                        self._build_meal_notes_prompt(goal, restrictions, plan)
+                    ))
+                return plan
 
         restrictions_str = ', '.join(restrictions) if restrictions else 'none'
+        relevant_docs = self._search(
+            f"{goal} meals nutrition", n_results=10,
+            filters=self._meal_filters(goal, restrictions)
+        )
+
+        prompt = self._build_meal_plan_prompt(
+            goal, restrictions_str, calories, meals_per_day, relevant_docs
+        )
+        response = self._generate_with_llm(prompt)
+        return self._parse_meal_plan(response, goal, meals_per_day)
+
+    async def agenerate_meal_plan(
+        self,
+        goal: str,
+        restrictions: Optional[List[str]] = None,
+        calories: Optional[int] = None,
+        meals_per_day: int = 3,
+        include_notes: bool = False
+    ) -> Dict[str, Any]:
+        """Async version of generate_meal_plan()"""
+        if self.meal_plan_engine == "local":
+            # The beam search is CPU-bound: keep it off the event loop
+            loop = asyncio.get_running_loop()
+            plan = await loop.run_in_executor(
+                self._search_executor, self._local_meal_plan, goal, restrictions, calories, meals_per_day
+            )
+            if plan is not None:
+                if include_notes:
+                    self._add_plan_notes(plan, await self._agenerate_with_llm(
+                        self._build_meal_notes_prompt(goal, restrictions, plan)
+                    ))
+                return plan
+
+        restrictions_str = ', '.join(restrictions) if restrictions else 'none'
+        relevant_docs = await self._asearch(
+            f"{goal} meals nutrition", n_results=10,
+            filters=self._meal_filters(goal, restrictions)
+        )
+
+        prompt = self._build_meal_plan_prompt(
+            goal, restrictions_str, calories, meals_per_day, relevant_docs
+        )
+        response = await self._agenerate_with_llm(prompt)
+        return self._parse_meal_plan(response, goal, meals_per_day)
+
+    @timed("planner")
+    def _local_meal_plan(
+        self,
+        goal: str,
+        restrictions: Optional[List[str]],
+        calories: Optional[int],
+        meals_per_day: int
+    ) -> Optional[Dict[str, Any]]:
+        """Optimised meal plan from the nutrition data, or None if no meal fits the filters"""
+        snapshot = self.snapshot
+        if snapshot is None:
+            return None
+
+        rows = np.flatnonzero(snapshot.mask(self._meal_filters(goal, restrictions)))
+        nutrients = np.column_stack([snapshot.column(name, rows) for name in ("calories", "protein", "carbs", "fat")])
+        meal_types = snapshot.labels("meal_type", "meal_types", rows)
+        optimizer = MealOptimizer.from_columns(nutrients, meal_types, lambda i: snapshot.metadata(int(rows[i])))
+        return optimizer.plan(goal, calories, meals_per_day)
+
+    @timed("prompt")
+    def _build_meal_notes_prompt(self, goal: str, restrictions: Optional[List[str]], plan: Dict[str, Any]) -> str:
+        """Prompt asking the LLM for short notes on a finished meal plan"""
+        meals = "\n".join(
+            f"{item['meal']}: {item['name']} x{item['servings']:g} ({item['calories']} kcal)"
+            for item in plan["daily_plan"]
+        )
+        return f"""You are SmartCoach AI. Write 3-5 short nutrition notes (plain text, one per line)
+for this {goal} meal plan (restrictions: {', '.join(restrictions) if restrictions else 'none'}):
+meal prep, timing and swaps. Do not change the meals or numbers.
+
+{meals}"""
+
+    @timed("prompt")
+    def _build_meal_plan_prompt(
+        self,
+        goal: str,
+        restrictions_str: str,
+        calories: Optional[int],
+        meals_per_day: int,
+        relevant_docs: List[str]
+    ) -> str:
+        """Build the meal plan prompt"""
         calories_str = f"{calories} kcal" if calories else "appropriate for goal"
-        relevant_docs = self._search(f"{goal} meals nutrition {restrictions_str}", n_results=10)
 
-        prompt = f"""Create a daily meal plan:
+        return f"""Create a daily meal plan:
 - Goal: {goal}
 - Dietary Restrictions: {restrictions_str}
 - Target Calories: {calories_str}
 - Meals per Day: {meals_per_day}
 
 MEAL DATABASE:
-{chr(10).join(relevant_docs[:7])}
+{self._pack_context(relevant_docs[:7], self.plan_context_tokens, separator=chr(10) * 2)}
 
 Return ONLY valid JSON:
 {{
@@ -362,7 +1286,8 @@ Return ONLY valid JSON:
     "tips": ["Nutrition tip"]
 }}"""
 
-        response = self._generate_with_llm(prompt)
+    def _parse_meal_plan(self, response: str, goal: str, meals_per_day: int) -> Dict[str, Any]:
+        """Parse the meal plan response"""
         return self._parse_json_response(response, {
             "name": f"{goal.title()} Meal Plan",
             "goal": goal,
@@ -370,6 +1295,7 @@ Return ONLY valid JSON:
             "description": response
         })
 
+    @timed("parse")
     def _parse_json_response(self, response: str, fallback: Dict) -> Dict:
         """Parse JSON from LLM response, with fallback"""
         try:
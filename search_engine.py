@@ -0,0 +1,268 @@
+"""
+Search Engine
+=============
+Inverted-index retrieval over sparse document-term weights (TF-IDF or BM25).
+
+The document-term matrix is transposed once into term -> postings lists,
+so a query only touches documents that share at least one term with it.
+Top-k selection uses argpartition instead of sorting every score; when
+the query's postings cover much of the corpus it runs directly on the
+dense per-document totals. TF-IDF rows and queries are L2-normalised when
+fitted, so the postings dot product is already the cosine similarity and
+no norms are computed at query time.
+
+BM25/BM25F is precomputed into the postings weights (saturated term
+frequency x IDF, with document-length normalisation applied per field),
+so scoring a query is the same postings dot product as for TF-IDF with
+all query term weights set to 1.
+"""
+
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+
+def top_k(doc_ids: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the k best (doc_ids, scores), highest score first"""
+    if k <= 0 or len(scores) == 0:
+        return doc_ids[:0], scores[:0]
+
+    if len(scores) > k:
+        best = np.argpartition(-scores, k - 1)[:k]
+        doc_ids, scores = doc_ids[best], scores[best]
+
+    order = np.argsort(-scores, kind="stable")
+    return doc_ids[order], scores[order]
+
+
+def top_k_dense(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """top_k over a score for every document (doc_id = position), without extracting the matches first"""
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64), scores[:0]
+
+    # Partition the negated scores at k - 1 (as top_k does): with kth near
+    # the end, the many tied zero scores make argpartition several times slower
+    best = np.argpartition(-scores, k - 1)[:k] if k < n else np.arange(n)
+    best.sort()  # ties in document order, as top_k over sorted matches
+    order = np.argsort(-scores[best], kind="stable")
+    return best[order], scores[best[order]]
+
+
+class InvertedIndex:
+    """
+    Term -> postings index built from a (documents x terms) sparse matrix.
+
+    Postings are stored CSC-style in three flat arrays: for term t, the
+    documents are postings_docs[postings_ptr[t]:postings_ptr[t + 1]] with
+    matching weights in postings_weights.
+    """
+
+    def __init__(self, doc_term_matrix: sparse.spmatrix):
+        postings = sparse.csc_matrix(doc_term_matrix, dtype=np.float32)
+        postings.sort_indices()
+
+        self.n_docs, self.n_terms = postings.shape
+        self.postings_ptr = postings.indptr
+        self.postings_docs = postings.indices
+        self.postings_weights = postings.data
+
+    @classmethod
+    def from_postings(
+        cls,
+        postings_ptr: np.ndarray,
+        postings_docs: np.ndarray,
+        postings_weights: np.ndarray,
+        shape: Tuple[int, int]
+    ) -> "InvertedIndex":
+        """Rebuild an index from previously saved postings arrays (no copy)"""
+        index = cls.__new__(cls)
+        index.n_docs, index.n_terms = shape
+        index.postings_ptr = postings_ptr
+        index.postings_docs = postings_docs
+        index.postings_weights = postings_weights
+        return index
+
+    @property
+    def doc_freq(self) -> np.ndarray:
+        """Number of indexed documents containing each term"""
+        return np.diff(self.postings_ptr)
+
+    @property
+    def doc_term_matrix(self) -> sparse.csc_matrix:
+        """The indexed (documents x terms) weights as a CSC view of the postings"""
+        return sparse.csc_matrix(
+            (self.postings_weights, self.postings_docs, self.postings_ptr),
+            shape=(self.n_docs, self.n_terms)
+        )
+
+    def _postings(
+        self,
+        term_ids: np.ndarray,
+        term_weights: np.ndarray,
+        doc_mask: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """(document, weighted contribution) for every posting of the query terms"""
+        starts = self.postings_ptr[term_ids]
+        ends = self.postings_ptr[term_ids + 1]
+
+        docs = []
+        contributions = []
+        for start, end, weight in zip(starts, ends, term_weights):
+            if end > start:
+                term_docs = self.postings_docs[start:end]
+                posting_weights = self.postings_weights[start:end]
+                if doc_mask is not None:
+                    allowed = doc_mask[term_docs]
+                    term_docs, posting_weights = term_docs[allowed], posting_weights[allowed]
+                docs.append(term_docs)
+                contributions.append(posting_weights * weight)
+
+        if not docs:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        return np.concatenate(docs), np.concatenate(contributions)
+
+    def _dense(self, n_postings: int) -> bool:
+        # Dense accumulation is cheaper once postings cover a good share of
+        # the corpus; otherwise only the touched documents are materialised.
+        return n_postings * 8 >= self.n_docs
+
+    def search(
+        self,
+        query_vector: sparse.spmatrix,
+        k: int,
+        min_score: float = 0.0,
+        doc_mask: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """Return up to k (doc_index, score) pairs scoring above min_score"""
+        query_vector = sparse.csr_matrix(query_vector)
+        docs, contributions = self._postings(query_vector.indices, query_vector.data, doc_mask)
+
+        if len(docs) and self._dense(len(docs)):
+            # Select straight from the dense totals: extracting the matched
+            # documents first costs several times more than the selection.
+            # Unmatched documents score 0 and fail the min_score check.
+            totals = np.bincount(docs, weights=contributions, minlength=self.n_docs)
+            doc_ids, scores = top_k_dense(totals, k)
+            keep = scores > min_score
+            return list(zip(doc_ids[keep].tolist(), scores[keep].tolist()))
+
+        if len(docs):
+            doc_ids, inverse = np.unique(docs, return_inverse=True)
+            scores = np.bincount(inverse, weights=contributions)
+        else:
+            doc_ids, scores = docs, contributions
+        keep = scores > min_score
+        doc_ids, scores = top_k(doc_ids[keep], scores[keep], k)
+        return list(zip(doc_ids.tolist(), scores.tolist()))
+
+
+def search_batch(
+    query_matrix: sparse.spmatrix,
+    doc_term_matrix: sparse.spmatrix,
+    k: int,
+    min_score: float = 0.0
+) -> List[List[Tuple[int, float]]]:
+    """
+    Score many queries at once with a single sparse matrix product.
+
+    Returns one list of up to k (doc_index, score) pairs per query row.
+    """
+    scores = sparse.csr_matrix(query_matrix @ doc_term_matrix.T)
+
+    results = []
+    for row in range(scores.shape[0]):
+        start, end = scores.indptr[row], scores.indptr[row + 1]
+        doc_ids = scores.indices[start:end]
+        row_scores = scores.data[start:end]
+
+        keep = row_scores > min_score
+        doc_ids, row_scores = top_k(doc_ids[keep], row_scores[keep], k)
+        results.append(list(zip(doc_ids.tolist(), row_scores.tolist())))
+    return results
+
+
+def term_counts(
+    texts: Iterable[str],
+    analyzer: Callable[[str], List[str]],
+    vocabulary: Dict[str, int],
+    chunk_size: int = 10000
+) -> Tuple[sparse.csr_matrix, np.ndarray]:
+    """
+    Raw term counts over a fixed vocabulary.
+
+    Returns the (documents x terms) count matrix and each text's length in
+    analyzed tokens (including out-of-vocabulary ones). Token positions are
+    only held for chunk_size texts at a time.
+    """
+    blocks, lengths = [], []
+    rows, cols = [], []
+    row = 0
+
+    def flush():
+        # COO -> CSR sums the duplicate (row, col) entries into counts
+        blocks.append(sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+            shape=(row, len(vocabulary))
+        ))
+        rows.clear()
+        cols.clear()
+
+    for text in texts:
+        tokens = analyzer(text) if text else []
+        lengths.append(len(tokens))
+        for token in tokens:
+            col = vocabulary.get(token)
+            if col is not None:
+                rows.append(row)
+                cols.append(col)
+        row += 1
+        if row == chunk_size:
+            flush()
+            row = 0
+    if row or not blocks:
+        flush()
+
+    counts = blocks[0] if len(blocks) == 1 else sparse.vstack(blocks, format="csr")
+    return counts, np.asarray(lengths, dtype=np.float32)
+
+
+def bm25_idf(doc_freq: np.ndarray, n_docs: int) -> np.ndarray:
+    """BM25 IDF (the non-negative variant) per term"""
+    return np.log1p((n_docs - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+
+
+def bm25_weights(
+    fields: Sequence[Tuple[sparse.csr_matrix, np.ndarray, float]],
+    k1: float = 1.2,
+    b: float = 0.75,
+    idf: Optional[np.ndarray] = None
+) -> sparse.csr_matrix:
+    """
+    BM25F document-term weights from per-field (counts, lengths, weight).
+
+    Each field's term frequencies are length-normalised against that
+    field's average length, weighted and summed, then saturated with k1
+    and multiplied by the BM25 IDF. With a single field of weight 1 this
+    is plain BM25.
+
+    idf defaults to the IDF of the given documents; pass the corpus IDF
+    to weight a few documents added to an existing index.
+    """
+    combined = None
+    for counts, lengths, weight in fields:
+        average = lengths.mean() if len(lengths) and lengths.mean() > 0 else 1.0
+        norms = (1.0 - b) + b * lengths / average
+        normalized = sparse.diags((weight / norms).astype(np.float32)) @ counts
+        combined = normalized if combined is None else combined + normalized
+
+    combined = sparse.csr_matrix(combined, dtype=np.float32)
+    combined.eliminate_zeros()
+
+    if idf is None:
+        idf = bm25_idf(np.bincount(combined.indices, minlength=combined.shape[1]), combined.shape[0])
+
+    tf = combined.data
+    combined.data = tf * (k1 + 1.0) / (tf + k1) * idf[combined.indices]
+    return combined
@@ -0,0 +1,144 @@
+"""
+Semantic Cache
+==============
+Reuses answers to earlier chat questions whose TF-IDF query vector is close
+enough (cosine >= threshold) to the new one.
+
+The query vector is the one _search already computes, so a lookup costs one
+sparse product against the cached vectors. Entries expire after a TTL and
+the least recently used entry is evicted when the cache is full.
+
+Vectors only make sense for the vocabulary they were built with, so the
+cache must be cleared whenever the search index is rebuilt or its
+vocabulary extended. clear() bumps a generation number; set() drops answers
+computed under an older one, so a request that straddles a rebuild can't
+put a stale vector back, and get() treats a vector of another width as a
+miss.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+
+class SemanticCache:
+    """Small vector index of answered questions"""
+
+    def __init__(self, threshold: float = 0.85, max_entries: int = 1024, ttl_seconds: float = 3600):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.generation = 0
+        self._entries: "OrderedDict[int, Tuple[sparse.csr_matrix, str, List[str], float]]" = OrderedDict()
+        self._next_id = 0
+        self._matrix: Optional[sparse.csr_matrix] = None
+        self._matrix_ids: List[int] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(query_vector: sparse.spmatrix) -> Optional[sparse.csr_matrix]:
+        vector = sparse.csr_matrix(query_vector, dtype=np.float32)
+        norm = np.sqrt(vector.multiply(vector).sum())
+        if norm == 0:
+            return None
+        return vector / norm
+
+    def get(self, query_vector: sparse.spmatrix) -> Optional[Tuple[str, List[str], float]]:
+        """Return (answer, sources, similarity) for the closest fresh entry above threshold"""
+        vector = self._normalize(query_vector)
+
+        with self._lock:
+            if vector is None or not self._entries:
+                self.misses += 1
+                return None
+
+            if self._matrix is None:
+                self._matrix_ids = list(self._entries)
+                self._matrix = sparse.vstack([self._entries[i][0] for i in self._matrix_ids], format="csr")
+            if self._matrix.shape[1] != vector.shape[1]:
+                # The vocabulary changed between the cached queries and this one
+                self.misses += 1
+                return None
+
+            similarities = (self._matrix @ vector.T).toarray().ravel()
+            now = time.monotonic()
+            for row in np.argsort(-similarities):
+                similarity = float(similarities[row])
+                if similarity < self.threshold:
+                    break
+                entry_id = self._matrix_ids[row]
+                _, answer, sources, expires_at = self._entries[entry_id]
+                if expires_at < now:
+                    continue
+                self._entries.move_to_end(entry_id)
+                self.hits += 1
+                return answer, sources, similarity
+
+            self.misses += 1
+            return None
+
+    def set(
+        self,
+        query_vector: sparse.spmatrix,
+        answer: str,
+        sources: List[str],
+        generation: Optional[int] = None
+    ) -> None:
+        vector = self._normalize(query_vector)
+        if vector is None:
+            return
+
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[self._next_id] = (vector, answer, sources, time.monotonic() + self.ttl_seconds)
+            self._next_id += 1
+            self._evict()
+            self._matrix = None
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        expired = [i for i, entry in self._entries.items() if entry[3] < now]
+        for entry_id in expired:
+            del self._entries[entry_id]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+            self.generation += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "threshold": self.threshold,
+            }
+
+
+def create_semantic_cache() -> Optional[SemanticCache]:
+    """Build the semantic cache from environment settings (None if disabled)"""
+    if os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+
+    return SemanticCache(
+        threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85")),
+        max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1024")),
+        ttl_seconds=float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "3600"))
+    )
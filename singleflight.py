@@ -0,0 +1,46 @@
+"""
+Single-Flight
+=============
+Coalesces concurrent async calls that share a key into one in-flight call.
+
+When many requests produce the same LLM prompt at the same time (e.g. a
+burst of identical beginner/strength/3-day workout plans), only the first
+one calls the LLM; the rest await the same future and share its result
+(or its exception).
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Per-event-loop registry of in-flight calls keyed by string"""
+
+    def __init__(self):
+        self._inflight: Dict[str, "asyncio.Future"] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn() unless a call for key is already in flight, then await its result"""
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+
+        # shield: a caller that disconnects must not cancel the shared call
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: "asyncio.Future") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._inflight)
@@ -1,8 +1,10 @@
 """Quick test script for the AI service"""
 import requests
 import json
+import os
 
 BASE_URL = "http://localhost:8000"
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
 
 def test_health():
     print("\n=== Testing Health Endpoint ===")
@@ -11,6 +13,21 @@ def test_health():
     print(f"Response: {response.json()}")
     return response.status_code == 200
 
+def test_probes():
+    print("\n=== Testing Liveness/Readiness Probes ===")
+    live = requests.get(f"{BASE_URL}/livez")
+    ready = requests.get(f"{BASE_URL}/readyz")
+    print(f"Live: {live.status_code} {live.json()}")
+    print(f"Ready: {ready.status_code} {ready.json()}")
+    return live.status_code == 200 and ready.status_code == 200
+
+def test_metrics():
+    print("\n=== Testing Metrics Endpoint ===")
+    response = requests.get(f"{BASE_URL}/metrics")
+    print(f"Status: {response.status_code}")
+    print(f"Series: {sum(1 for line in response.text.splitlines() if not line.startswith('#'))}")
+    return response.status_code == 200 and "http_requests_total" in response.text
+
 def test_chat():
     print("\n=== Testing Chat Query ===")
     data = {
@@ -24,6 +41,80 @@ def test_chat():
     print(f"Sources found: {len(result.get('sources', []))}")
     return response.status_code == 200
 
+def test_chat_stream():
+    print("\n=== Testing Streaming Chat Query ===")
+    data = {
+        "query": "What is a good chest workout for beginners?",
+        "user_id": "test123"
+    }
+    response = requests.post(f"{BASE_URL}/rag/query/stream", json=data, stream=True)
+    print(f"Status: {response.status_code}")
+    events = [line[len("event: "):] for line in response.iter_lines(decode_unicode=True)
+              if line.startswith("event: ")]
+    print(f"Events: {events[0]}, {events.count('token')} x token, {events[-1]}")
+    return response.status_code == 200 and events[0] == "sources" and events[-1] == "done"
+
+def test_chat_batch():
+    print("\n=== Testing Batch Chat Query ===")
+    data = {
+        "queries": [
+            {"query": "What is a good chest workout for beginners?"},
+            {"query": "High protein breakfast ideas?"},
+            {"query": "How important is sleep for recovery?"}
+        ],
+        "max_concurrency": 2
+    }
+    response = requests.post(f"{BASE_URL}/rag/query/batch", json=data)
+    print(f"Status: {response.status_code}")
+    results = response.json()["results"]
+    print(f"Results: {len(results)}, sources per query: {[len(r.get('sources') or []) for r in results]}")
+    return response.status_code == 200 and len(results) == len(data["queries"])
+
+def test_documents():
+    print("\n=== Testing Document Add/Delete ===")
+    if not ADMIN_TOKEN:
+        print("Skipped (set ADMIN_TOKEN)")
+        return True
+    headers = {"X-Admin-Token": ADMIN_TOKEN}
+    data = {"type": "tip", "data": {"topic": "Test tip", "category": "general", "content": "Zyxwv test tip"}}
+    # Answered (and cached) before "zyxwv" joins the vocabulary
+    before = requests.post(f"{BASE_URL}/rag/query", json={"query": "zyxwv test tip"})
+    added = requests.post(f"{BASE_URL}/admin/documents", json=data, headers=headers)
+    print(f"Add: {added.status_code} {added.json()}")
+    found = requests.post(f"{BASE_URL}/rag/query", json={"query": "zyxwv test tip"})
+    print(f"Query before/after add: {before.status_code}/{found.status_code}")
+    deleted = requests.delete(f"{BASE_URL}/admin/documents/{added.json()['id']}", headers=headers)
+    print(f"Delete: {deleted.status_code}")
+    return (before.status_code == 200 and added.status_code == 201 and deleted.status_code == 200
+            and found.status_code == 200 and any("Zyxwv" in s for s in found.json()["sources"]))
+
+def test_document_filters():
+    print("\n=== Testing Filters on Added Documents ===")
+    if not ADMIN_TOKEN:
+        print("Skipped (set ADMIN_TOKEN)")
+        return True
+    headers = {"X-Admin-Token": ADMIN_TOKEN}
+    # Exactly a one-meal build_muscle day at 2500 kcal, but tagged for another goal
+    meal = {"name": "Zyxwv bowl", "type": "lunch", "calories": 2500, "protein": 187.5, "carbs": 281.25,
+            "fat": 69.44, "ingredients": ["rice", "tofu"], "goal": ["lose_weight"]}
+    request = {"user_id": "test123", "goal": "build_muscle", "calories_target": 2500, "meals_per_day": 1}
+
+    def planned():
+        plan = requests.post(f"{BASE_URL}/rag/meal-plan", json=request).json()["plan"]
+        return [item["name"] for item in plan.get("daily_plan", [])]
+
+    added = requests.post(f"{BASE_URL}/admin/documents", json={"id": "test-zyxwv-bowl", "type": "meal", "data": meal},
+                          headers=headers)
+    other_goal = planned()
+    updated = requests.put(f"{BASE_URL}/admin/documents/test-zyxwv-bowl",
+                           json={"type": "meal", "data": {**meal, "goal": ["build_muscle"]}}, headers=headers)
+    same_goal = planned()
+    deleted = requests.delete(f"{BASE_URL}/admin/documents/test-zyxwv-bowl", headers=headers)
+    print(f"Add/update/delete: {added.status_code}/{updated.status_code}/{deleted.status_code}")
+    print(f"Planned for another goal: {other_goal}, for its goal: {same_goal}")
+    return (added.status_code == 201 and updated.status_code == 200 and deleted.status_code == 200
+            and "Zyxwv bowl" not in other_goal and "Zyxwv bowl" in same_goal)
+
 def test_workout_plan():
     print("\n=== Testing Workout Plan Generation ===")
     data = {
@@ -58,9 +149,15 @@ if __name__ == "__main__":
 
     results = []
     results.append(("Health", test_health()))
+    results.append(("Probes", test_probes()))
     results.append(("Chat", test_chat()))
+    results.append(("Chat Stream", test_chat_stream()))
+    results.append(("Chat Batch", test_chat_batch()))
     results.append(("Workout Plan", test_workout_plan()))
     results.append(("Meal Plan", test_meal_plan()))
+    results.append(("Documents", test_documents()))
+    results.append(("Document Filters", test_document_filters()))
+    results.append(("Metrics", test_metrics()))
 
     print("\n" + "=" * 50)
     print("RESULTS:")
@@ -0,0 +1,106 @@
+"""
+Text Vectorizer
+===============
+Serving-time replacement for sklearn's fitted TfidfVectorizer.
+
+The prebuilt index stores the fitted vocabulary, IDF weights and analyzer
+settings, which is all transform() needs. Rebuilding them into this class
+instead of a TfidfVectorizer means a process serving from the artifact
+never imports scikit-learn (the largest part of startup import time).
+Output matches TfidfVectorizer.transform for the settings RAGSystem uses
+(word analyzer, no accent stripping, no custom preprocessor).
+"""
+
+import re
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+
+class QueryVectorizer:
+    """Fitted TF-IDF transform: tokenize, stop-word filter, n-grams, tf x idf, normalise"""
+
+    def __init__(
+        self,
+        vocabulary: Dict[str, int],
+        idf: np.ndarray,
+        stop_words: Optional[Iterable[str]] = None,
+        ngram_range: Tuple[int, int] = (1, 1),
+        lowercase: bool = True,
+        token_pattern: str = r"(?u)\b\w\w+\b",
+        norm: Optional[str] = "l2",
+        sublinear_tf: bool = False
+    ):
+        self.vocabulary_ = vocabulary
+        self.idf_ = np.asarray(idf)
+        self.stop_words = frozenset(stop_words or ())
+        self.ngram_range = tuple(ngram_range)
+        self.lowercase = lowercase
+        self.token_pattern = token_pattern
+        self.norm = norm
+        self.sublinear_tf = sublinear_tf
+        self._token_regex = re.compile(token_pattern)
+
+    def get_stop_words(self) -> Optional[frozenset]:
+        return self.stop_words or None
+
+    def get_feature_names_out(self) -> np.ndarray:
+        terms = [""] * len(self.vocabulary_)
+        for term, index in self.vocabulary_.items():
+            terms[index] = term
+        return np.asarray(terms, dtype=object)
+
+    def build_analyzer(self) -> Callable[[str], List[str]]:
+        return self._analyze
+
+    def _analyze(self, text: str) -> List[str]:
+        """Same token sequence as sklearn's word analyzer"""
+        if self.lowercase:
+            text = text.lower()
+        tokens = [t for t in self._token_regex.findall(text) if t not in self.stop_words]
+
+        min_n, max_n = self.ngram_range
+        if max_n == 1:
+            return tokens if min_n == 1 else []
+
+        ngrams = list(tokens) if min_n == 1 else []
+        for n in range(max(min_n, 2), min(max_n, len(tokens)) + 1):
+            ngrams.extend(map(" ".join, zip(*(tokens[i:] for i in range(n)))))
+        return ngrams
+
+    def transform(self, texts: Sequence[str]) -> sparse.csr_matrix:
+        """(len(texts) x vocabulary) TF-IDF matrix"""
+        indptr = [0]
+        indices: List[int] = []
+        values: List[float] = []
+        vocabulary = self.vocabulary_
+        for text in texts:
+            for term, count in Counter(self._analyze(text)).items():
+                column = vocabulary.get(term)
+                if column is not None:
+                    indices.append(column)
+                    values.append(count)
+            indptr.append(len(indices))
+
+        matrix = sparse.csr_matrix(
+            (np.asarray(values, dtype=np.float64), np.asarray(indices, dtype=np.int32), np.asarray(indptr)),
+            shape=(len(texts), len(self.vocabulary_))
+        )
+        matrix.sort_indices()
+
+        if self.sublinear_tf:
+            np.log(matrix.data, matrix.data)
+            matrix.data += 1
+        matrix.data *= self.idf_[matrix.indices]
+
+        if self.norm in ("l1", "l2") and matrix.nnz:
+            rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+            if self.norm == "l2":
+                lengths = np.sqrt(np.bincount(rows, weights=matrix.data ** 2, minlength=matrix.shape[0]))
+            else:
+                lengths = np.bincount(rows, weights=np.abs(matrix.data), minlength=matrix.shape[0])
+            lengths[lengths == 0] = 1.0
+            matrix.data /= lengths[rows]
+        return matrix
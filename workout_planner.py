@@ -0,0 +1,252 @@
+"""
+Workout Planner
+===============
+Rule-based workout plans built directly from the exercise catalogue.
+
+Every exercise already has sets, reps, difficulty, muscle group and
+equipment, so assembling a weekly split doesn't need an LLM:
+
+1. Pick a split from days_per_week (full body, upper/lower, push/pull/legs)
+2. Walk each day's muscle-group slots, rotating through the exercises of
+   that group so repeated day types get different exercises
+3. Stop adding exercises once the estimated session time would exceed
+   duration_minutes (sets x (work + rest), plus warm-up and cool-down)
+
+Plans are deterministic for the same inputs and take well under a
+millisecond for the bundled catalogue. A week only walks the first few
+exercises of each group, so for large catalogues first_per_group picks
+those from the metadata columns and LazyExercises decodes the ones the
+plan actually reaches.
+"""
+
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+WARMUP_MINUTES = 5
+COOLDOWN_MINUTES = 5
+SECONDS_PER_REP = 3
+DEFAULT_WORK_SECONDS = 40
+# Time to move between exercises (set up equipment, walk over)
+TRANSITION_SECONDS = 60
+
+# Muscle-group slots per day type, most important first
+DAY_TEMPLATES = {
+    "Full Body": ["legs", "chest", "back", "shoulders", "core", "full body", "arms", "legs", "cardio"],
+    "Upper Body": ["chest", "back", "shoulders", "arms", "chest", "back", "arms", "core"],
+    "Lower Body": ["legs", "legs", "full body", "core", "legs", "cardio", "core"],
+    "Push": ["chest", "shoulders", "chest", "arms", "shoulders", "core"],
+    "Pull": ["back", "back", "arms", "arms", "core", "full body"],
+    "Legs": ["legs", "legs", "full body", "legs", "core", "cardio"],
+}
+
+# days_per_week -> (split name, day types in order)
+SPLITS = {
+    1: ("full_body", ["Full Body"]),
+    2: ("full_body", ["Full Body"] * 2),
+    3: ("full_body", ["Full Body"] * 3),
+    4: ("upper_lower", ["Upper Body", "Lower Body"] * 2),
+    5: ("push_pull_legs", ["Push", "Pull", "Legs", "Upper Body", "Lower Body"]),
+    6: ("push_pull_legs", ["Push", "Pull", "Legs"] * 2),
+    7: ("push_pull_legs", ["Push", "Pull", "Legs"] * 2 + ["Full Body"]),
+}
+
+# Goal keyword -> (rest seconds between sets, add a cardio finisher)
+GOAL_SETTINGS = {
+    "strength": (120, False),
+    "muscle": (75, False),
+    "lose": (45, True),
+    "fat": (45, True),
+    "cardio": (30, True),
+    "endurance": (30, True),
+}
+DEFAULT_GOAL_SETTINGS = (60, False)
+
+DIFFICULTY_ORDER = {"advanced": 0, "intermediate": 1, "beginner": 2}
+DEFAULT_SETS = 3
+
+# A group's rotation never gets this deep in one week: a group fills at
+# most about 16 slots, each skipping at most that day's other exercises
+CANDIDATES_PER_GROUP = 48
+
+
+def goal_settings(goal: str) -> Tuple[int, bool]:
+    """(rest_seconds, cardio_finisher) for a free-form goal ("build_muscle", "lose_weight"...)"""
+    goal = (goal or "").lower()
+    for keyword, settings in GOAL_SETTINGS.items():
+        if keyword in goal:
+            return settings
+    return DEFAULT_GOAL_SETTINGS
+
+
+def parse_sets(sets: Any) -> int:
+    """Number of sets from a catalogue value (4, "4", "3-4" -> 3), DEFAULT_SETS if it has no leading number"""
+    match = re.match(r"\s*(\d+)", str(sets)) if sets is not None else None
+    return int(match.group(1)) if match and int(match.group(1)) > 0 else DEFAULT_SETS
+
+
+def planner_order(difficulty: np.ndarray, name_rank: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """
+    Sort key matching WorkoutPlanner's exercise order (hardest first, then
+    by name, then catalogue order) from difficulty codes (index into
+    beginner/intermediate/advanced, -1 unknown) and name ranks.
+    """
+    order = np.where(difficulty < 0, 3, 2 - difficulty.astype(np.int64))
+    n_names = int(name_rank.max()) + 2 if len(name_rank) else 1
+    n_rows = int(rows.max()) + 1 if len(rows) else 1
+    return (order * n_names + name_rank + 1) * n_rows + rows
+
+
+def first_per_group(groups: np.ndarray, order: np.ndarray, limit: int = CANDIDATES_PER_GROUP) -> Dict[int, np.ndarray]:
+    """Group code -> positions of the group's limit smallest order values, smallest first"""
+    firsts = {}
+    for group in np.unique(groups):
+        members = np.flatnonzero(groups == group)
+        if len(members) > limit:
+            members = members[np.argpartition(order[members], limit - 1)[:limit]]
+        firsts[int(group)] = members[np.argsort(order[members])]
+    return firsts
+
+
+def exercise_order(exercise: Dict[str, Any]) -> Tuple[int, str]:
+    """Hardest first (the filters already capped difficulty at the user's level), then by name"""
+    return DIFFICULTY_ORDER.get(exercise.get("difficulty"), 3), exercise["name"]
+
+
+class LazyExercises:
+    """Exercises by document index, loaded on first access (a plan reads only a few per group)"""
+
+    def __init__(self, indices: np.ndarray, load: Callable[[int], Dict[str, Any]]):
+        self.indices = indices
+        self.load = load
+        self._loaded: Dict[int, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __getitem__(self, position: int) -> Dict[str, Any]:
+        if position not in self._loaded:
+            self._loaded[position] = self.load(int(self.indices[position]))
+        return self._loaded[position]
+
+
+def work_seconds(reps: Any) -> int:
+    """Estimated working time of one set from a reps string ("8-12", "30 seconds", "10-12 each leg")"""
+    text = str(reps).lower()
+    numbers = [int(n) for n in re.findall(r"\d+", text)]
+    if not numbers:
+        return DEFAULT_WORK_SECONDS
+    if "sec" in text:
+        return max(numbers)
+    seconds = max(numbers) * SECONDS_PER_REP
+    return seconds * 2 if "each" in text else seconds
+
+
+def exercise_minutes(sets: int, reps: Any, rest_seconds: int) -> float:
+    """Estimated minutes for all sets of one exercise, including rest and setup"""
+    return (sets * work_seconds(reps) + (sets - 1) * rest_seconds + TRANSITION_SECONDS) / 60.0
+
+
+class WorkoutPlanner:
+    """Builds weekly splits from exercise metadata dicts (name, muscle_group, difficulty, sets, reps)"""
+
+    def __init__(self, exercises: List[Dict[str, Any]]):
+        self.by_group: Dict[str, Sequence[Dict[str, Any]]] = {}
+        for exercise in sorted(exercises, key=exercise_order):
+            self.by_group.setdefault(exercise.get("muscle_group") or "other", []).append(exercise)
+
+    @classmethod
+    def from_groups(cls, by_group: Dict[str, Sequence[Dict[str, Any]]]) -> "WorkoutPlanner":
+        """Planner over exercises already grouped by muscle group and in exercise_order"""
+        planner = cls([])
+        planner.by_group = by_group
+        return planner
+
+    def plan(self, goal: str, days_per_week: int = 3, duration_minutes: int = 45) -> Dict[str, Any]:
+        """Weekly plan in the same shape as the LLM workout plan JSON"""
+        days_per_week = min(max(days_per_week or 3, 1), 7)
+        duration_minutes = max(duration_minutes or 45, WARMUP_MINUTES + COOLDOWN_MINUTES + 5)
+        split, day_types = SPLITS[days_per_week]
+        rest_seconds, cardio_finisher = goal_settings(goal)
+
+        # Shared across the week so a repeated day type rotates exercises
+        cursors: Dict[str, int] = {}
+        workouts = []
+        for day, day_type in enumerate(day_types, 1):
+            slots = list(DAY_TEMPLATES[day_type])
+            if cardio_finisher:
+                slots.insert(min(3, len(slots)), "cardio")
+            exercises, minutes = self._fill_day(slots, cursors, rest_seconds, duration_minutes)
+            workouts.append({
+                "day": day,
+                "name": day_type,
+                "duration_minutes": round(minutes),
+                "exercises": exercises,
+                "warmup": f"{WARMUP_MINUTES} min light cardio and dynamic stretching",
+                "cooldown": f"{COOLDOWN_MINUTES} min stretching"
+            })
+
+        return {
+            "name": f"{goal.replace('_', ' ').title()} {split.replace('_', ' ').title()} Plan",
+            "days_per_week": days_per_week,
+            "split": split,
+            "workouts": workouts
+        }
+
+    def _fill_day(
+        self,
+        slots: List[str],
+        cursors: Dict[str, int],
+        rest_seconds: int,
+        duration_minutes: int
+    ) -> Tuple[List[Dict[str, Any]], float]:
+        """Pick exercises slot by slot until the session time budget is used"""
+        budget = duration_minutes - WARMUP_MINUTES - COOLDOWN_MINUTES
+        used = 0.0
+        chosen: List[Dict[str, Any]] = []
+        names = set()
+
+        for group in slots:
+            exercise, cursor = self._next_exercise(group, cursors.get(group, 0), names)
+            if exercise is None:
+                continue
+            sets = parse_sets(exercise.get("sets"))
+            minutes = exercise_minutes(sets, exercise.get("reps"), rest_seconds)
+            if used + minutes > budget:
+                # Drop a set rather than the exercise if that makes it fit
+                if sets > 2 and used + exercise_minutes(sets - 1, exercise.get("reps"), rest_seconds) <= budget:
+                    sets -= 1
+                    minutes = exercise_minutes(sets, exercise.get("reps"), rest_seconds)
+                else:
+                    continue
+
+            cursors[group] = cursor
+            names.add(exercise["name"])
+            used += minutes
+            chosen.append({
+                "name": exercise["name"],
+                "muscle_group": exercise.get("muscle_group"),
+                "sets": sets,
+                "reps": str(exercise.get("reps") or "10-12"),
+                "rest_seconds": rest_seconds
+            })
+
+        return chosen, used + WARMUP_MINUTES + COOLDOWN_MINUTES
+
+    def _next_exercise(
+        self,
+        group: str,
+        cursor: int,
+        exclude: set
+    ) -> Tuple[Optional[Dict[str, Any]], int]:
+        """
+        Next exercise for a muscle group in rotation, skipping ones already
+        in today's session. Returns (exercise, cursor after it).
+        """
+        candidates = self.by_group.get(group, [])
+        for index in range(cursor, cursor + len(candidates)):
+            exercise = candidates[index % len(candidates)]
+            if exercise["name"] not in exclude:
+                return exercise, index + 1
+        return None, cursor